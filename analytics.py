@@ -0,0 +1,182 @@
+import calendar
+import numpy as np
+import pandas as pd
+from data_store import ipc_view
+
+# --- KYRIX ANALYTICS CUBE ---
+# Filing counts pre-aggregated once per dataset. The Strategic Analysis tabs slice
+# and roll these up instead of regrouping the record frames on every interaction.
+# Two cubes because the grains differ: records are counted once, while IPC tabs
+# count one row per (record, IPC code) link, as the exploded frame always did.
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+CUBE_DIMS = ['Year', 'Month', 'Application Type (ID)', 'Firm']
+IPC_CUBE_DIMS = CUBE_DIMS + ['IPC_Class3', 'IPC_Section']
+# Records aggregated at a time, so the record/IPC join never spans the whole dataset
+CUBE_BLOCK = 200_000
+
+def build_cubes(df_analysis, df_exp):
+    if len(df_analysis) <= CUBE_BLOCK: return _block_cubes(df_analysis, df_exp)
+    row_ids = df_exp['row_id'].to_numpy()
+    parts = []
+    for start in range(0, len(df_analysis), CUBE_BLOCK):
+        block = df_analysis.iloc[start:start + CUBE_BLOCK]
+        lo, hi = np.searchsorted(row_ids, [block.index[0], block.index[-1] + 1])
+        parts.append(_block_cubes(block, df_exp.iloc[lo:hi]))
+    return tuple(rollup(pd.concat(cubes, ignore_index=True), dims) for cubes, dims in zip(zip(*parts), (CUBE_DIMS, IPC_CUBE_DIMS)))
+
+# df_exp rows must be sorted by row_id (preprocess writes them in record order)
+def _block_cubes(df_analysis, df_exp):
+    records = df_analysis[['Year', 'Application Type (ID)', 'Firm']].assign(Month=df_analysis['AppDate'].dt.month)
+    cube = records.groupby(CUBE_DIMS, observed=True).size().reset_index(name='N')
+    links = ipc_view(df_analysis, df_exp, ['Year', 'Application Type (ID)', 'Firm', 'AppDate'])
+    links['Month'] = links['AppDate'].dt.month
+    ipc_cube = links.groupby(IPC_CUBE_DIMS, observed=True).size().reset_index(name='N')
+    return cube, ipc_cube
+
+# Cubes after a snapshot switch: counts of the dropped records (removed cubes) come off
+# and those of the new records (added cubes) go on; unchanged records are never regrouped
+def update_cubes(cubes, removed, added):
+    return tuple(_merge_cube(c, r, a, dims) for c, r, a, dims in zip(cubes, removed, added, (CUBE_DIMS, IPC_CUBE_DIMS)))
+
+def _merge_cube(cube, removed, added, dims):
+    merged = pd.concat([cube, removed.assign(N=-removed['N']), added], ignore_index=True)
+    merged = merged.groupby(dims, observed=True)['N'].sum().reset_index()
+    merged = merged[merged['N'] != 0].reset_index(drop=True)
+    for col in dims:
+        if isinstance(cube[col].dtype, pd.CategoricalDtype): merged[col] = merged[col].astype('category')
+    return merged
+
+# filters: {column: allowed values}; None leaves that dimension unfiltered
+def slice_cube(cube, filters):
+    mask = np.ones(len(cube), dtype=bool)
+    for col, values in filters.items():
+        if values is not None: mask &= cube[col].isin(values).to_numpy()
+    return cube[mask]
+
+# Sum of counts over the dimensions not listed in `by`
+def rollup(cube, by, name='N'):
+    return cube.groupby(by, observed=True)['N'].sum().reset_index(name=name)
+
+# Link counts at one IPC hierarchy level under a code, from its range of the hierarchy's links,
+# e.g. main groups under B63B per year: ipc_counts(ipc, df_analysis, 'IPC_Group', 'B63B', by=['Year'])
+# filters: {column: allowed values} over df_analysis columns or the level itself
+def ipc_counts(hierarchy, df_analysis, level, under=None, by=(), filters=None, name='Count'):
+    links = hierarchy.links(under, level)
+    filters = {c: v for c, v in (filters or {}).items() if v is not None}
+    cols = [c for c in dict.fromkeys(list(by) + list(filters)) if c != level]
+    pos = df_analysis.index.get_indexer(links['row_id'])
+    keep = pos >= 0
+    view = df_analysis[cols].iloc[pos[keep]].reset_index(drop=True)
+    view[level] = links.loc[keep, level].array
+    view = slice_cube(view, filters)
+    return view.groupby(list(by) + [level], observed=True).size().reset_index(name=name)
+
+# --- TREND ENGINE ---
+# Dense (entity x type x month) filing counts for one cube dimension, so rolling
+# windows, YoY growth and CAGR run for every entity at once as NumPy array ops.
+# Months span whole calendar years, first to last filing year.
+class TrendEngine:
+    def __init__(self, cube, entity):
+        self.entity = entity
+        ent_codes, self.entities = pd.factorize(cube[entity], sort=True)
+        type_codes, self.types = pd.factorize(cube['Application Type (ID)'], sort=True)
+        self.first_year = int(cube['Year'].min()) if len(cube) else 0
+        n_years = int(cube['Year'].max()) - self.first_year + 1 if len(cube) else 0
+        self.months = pd.date_range(f"{self.first_year}-01-01", periods=12 * n_years, freq='MS') if n_years else pd.DatetimeIndex([])
+        month_idx = (cube['Year'].to_numpy() - self.first_year) * 12 + cube['Month'].to_numpy() - 1
+        self.counts = np.zeros((len(self.entities), len(self.types), len(self.months)), dtype=np.int32)
+        np.add.at(self.counts, (ent_codes, type_codes, month_idx), cube['N'].to_numpy())
+
+    # counts[entity, type, month] restricted to the given entities/types (with their labels);
+    # months outside `years` are zeroed and the axis is cut to whole years min(years)..max(years)
+    def window(self, types=None, entities=None, years=None):
+        counts = self.counts
+        ents, type_labels = self.entities, self.types
+        if entities is not None:
+            ent_pos = self.entities.get_indexer(entities)
+            ent_pos = ent_pos[ent_pos >= 0]
+            counts, ents = counts[ent_pos], self.entities[ent_pos]
+        if types is not None:
+            type_pos = self.types.get_indexer(types)
+            type_pos = type_pos[type_pos >= 0]
+            counts, type_labels = counts[:, type_pos], self.types[type_pos]
+        months = self.months
+        if years is not None and len(years) and len(months):
+            idx = np.arange((min(years) - self.first_year) * 12, (max(years) - self.first_year + 1) * 12)
+            valid = (idx >= 0) & (idx < len(months)) & np.isin(idx // 12 + self.first_year, list(years))
+            out = np.zeros(counts.shape[:-1] + (len(idx),), dtype=counts.dtype)
+            out[..., valid] = counts[..., idx[valid]]
+            counts = out
+            months = pd.date_range(f"{min(years)}-01-01", periods=len(idx), freq='MS')
+        return counts, ents, type_labels, months
+
+# Trailing sum over the last `window` months (partial windows at the start, like rolling(min_periods=1))
+def rolling_sum(counts, window):
+    cs = np.cumsum(counts, axis=-1, dtype=np.float64)
+    out = cs.copy()
+    out[..., window:] -= cs[..., :-window]
+    return out
+
+# Trailing mean: the sum over the months actually in the window
+def rolling_mean(counts, window):
+    return rolling_sum(counts, window) / np.minimum(np.arange(1, counts.shape[-1] + 1), window)
+
+ROLLING_STATS = {'sum': rolling_sum, 'mean': rolling_mean}
+
+# Trailing-12-month volume vs the 12 months before it; NaN where the earlier year is empty
+def yoy_growth(counts):
+    ttm = rolling_sum(counts, 12)
+    prev = np.full_like(ttm, np.nan)
+    prev[..., 12:] = ttm[..., :-12]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(prev > 0, ttm / prev - 1, np.nan)
+
+# Monthly axis (whole years) -> yearly totals
+def annual_totals(counts):
+    return counts.reshape(counts.shape[:-1] + (-1, 12)).sum(axis=-1)
+
+# CAGR per row of yearly totals, from each entity's first active year to the last year
+def cagr(annual):
+    n_years = annual.shape[-1]
+    active = annual > 0
+    first = np.where(active.any(axis=-1), active.argmax(axis=-1), n_years - 1)
+    start = np.take_along_axis(annual, first[..., None], axis=-1)[..., 0].astype(np.float64)
+    periods = n_years - 1 - first
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((start > 0) & (periods > 0), (annual[..., -1] / start) ** (1.0 / periods) - 1, np.nan)
+
+# Entities ranked by CAGR over the selected years; counts is (entity, month) on whole years
+def growth_ranking(counts, entities, label, min_total=5, top=15):
+    annual = annual_totals(counts)
+    ranking = pd.DataFrame({
+        label: np.asarray(entities),
+        'Total Apps': annual.sum(axis=-1),
+        'Last Year Apps': annual[:, -1] if annual.shape[-1] else 0,
+        'CAGR %': cagr(annual) * 100,
+        'Latest YoY %': yoy_growth(counts)[:, -1] * 100 if counts.shape[-1] else np.nan,
+    })
+    ranking = ranking[(ranking['Total Apps'] >= min_total) & ranking['CAGR %'].notna()]
+    return ranking.sort_values('CAGR %', ascending=False).head(top).round(1).reset_index(drop=True)
+
+# --- LANDING SUMMARY ---
+# The few numbers the Strategic Analysis view opens on, small enough to save as JSON next
+# to the cached dataset and show before the frames are loaded
+LANDING_TOP_FIRMS = 10
+
+def landing_summary(cube, df_analysis, n_records, top=LANDING_TOP_FIRMS):
+    year_type = rollup(cube, ['Year', 'Application Type (ID)'], 'Count')
+    firms = rollup(cube[cube['Firm'] != "DIRECT FILING"], 'Firm', 'Apps').nlargest(top, 'Apps')
+    latest = df_analysis['AppDate'].max() if len(df_analysis) else pd.NaT
+    return {
+        'records': int(n_records),
+        'analyzed': int(cube['N'].sum()),
+        'latest_filing': latest.strftime('%Y-%m-%d') if pd.notna(latest) else None,
+        'types': sorted(str(t) for t in year_type['Application Type (ID)'].unique()),
+        'year_type': {
+            'Year': year_type['Year'].astype(int).tolist(),
+            'Application Type (ID)': year_type['Application Type (ID)'].astype(str).tolist(),
+            'Count': year_type['Count'].astype(int).tolist(),
+        },
+        'top_firms': {'Firm': firms['Firm'].astype(str).tolist(), 'Apps': firms['Apps'].astype(int).tolist()},
+    }
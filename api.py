@@ -0,0 +1,282 @@
+import os
+import hmac
+import json
+import asyncio
+import argparse
+import ipaddress
+from datetime import date, datetime
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+from data_store import data_paths
+from snapshots import SnapshotManager
+from analytics import CUBE_DIMS, IPC_CUBE_DIMS, ROLLING_STATS, slice_cube, rollup, growth_ranking, ipc_counts
+from ipc_hierarchy import IPC_LEVELS
+from similarity import DUPLICATE_THRESHOLD, duplicate_groups
+
+# --- KYRIX HEADLESS API ---
+# The search engine and Strategic Analysis aggregations without Streamlit: KyrixService is
+# importable on its own, and serve() puts it behind a small asyncio HTTP/JSON server. One
+# in-memory dataset (snapshot) is shared by every request; work runs on a thread pool so
+# batch queries and reports proceed concurrently.
+# Records carry applicant and agent emails, phone numbers and addresses. The server has no
+# user accounts: it listens on loopback only, unless a token is set (--token or
+# KYRIX_API_TOKEN), in which case every request must send 'Authorization: Bearer <token>'.
+#   python api.py [--host 127.0.0.1] [--port 8765] [--token SECRET]
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+MAX_BODY = 1 << 20
+# Record columns returned with similar filings and near-duplicate groups
+SUMMARY_COLUMNS = ['Application Number', 'Title in English', 'Data of Applicant - Legal Name in English', 'Application Date']
+
+class KyrixService:
+    def __init__(self, manager=None, paths=None):
+        self.manager = manager if manager is not None else SnapshotManager()
+        self.paths = paths
+
+    # The requested snapshot, or the newest extract (re-checked cheaply on every call)
+    def dataset(self, snapshot=None):
+        latest = self.manager.log.ingest(self.paths or data_paths())
+        live = self.manager.get(latest if snapshot is None else int(snapshot))
+        if live.snapshot_id is None: raise LookupError("no dataset loaded")
+        return live
+
+    def snapshots(self):
+        return [{k: e[k] for k in ('id', 'source', 'created', 'records', 'added', 'changed', 'removed')} for e in self.manager.log.entries]
+
+    def diff(self, old, new):
+        return self.manager.log.diff(int(old), int(new))
+
+    # Global query plus field filters ({column: query}), ranked by BM25 (or in file order)
+    def search(self, query='', filters=None, limit=DEFAULT_LIMIT, offset=0, ranked=True, columns=None, snapshot=None):
+        live = self.dataset(snapshot)
+        df_search = live.dataset[0]
+        limit, offset = min(max(int(limit), 0), MAX_LIMIT), max(int(offset), 0)
+        plan = live.index.compile(query or '', filters or {})
+        hits = live.index.execute(plan)
+        if ranked:
+            page, scores = live.index.rank(plan, hits, k=offset + limit)
+            page, scores = page[offset:], scores[offset:]
+        else:
+            page, scores = hits[offset:offset + limit], None
+        records = df_search.iloc[page]
+        if columns: records = records[[c for c in columns if c in records.columns]]
+        records = records.astype(object).assign(_row=page)
+        if scores is not None: records = records.assign(_score=np.round(scores, 4))
+        return {'snapshot': live.snapshot_id, 'total': int(len(hits)), 'offset': offset, 'records': records}
+
+    # Nearest filings to one application by TF-IDF cosine over title + abstract
+    def similar(self, number, k=10, snapshot=None):
+        live = self.dataset(snapshot)
+        positions = live.numbers.get_indexer_for([number])
+        if positions[0] < 0: raise LookupError(f"unknown application number '{number}'")
+        ids, scores = live.similarity.similar(positions[0], min(int(k), MAX_LIMIT))
+        return live.dataset[0].iloc[ids][SUMMARY_COLUMNS].astype(object).assign(Similarity=np.round(scores, 4))
+
+    # Every near-duplicate group (MinHash/LSH), largest first; Group is the group's first row
+    def duplicates(self, threshold=DUPLICATE_THRESHOLD, snapshot=None):
+        live = self.dataset(snapshot)
+        groups = duplicate_groups(live.similarity.clusters(float(threshold)))
+        records = live.dataset[0].iloc[groups['row']][SUMMARY_COLUMNS].astype(object)
+        return records.assign(Group=groups['cluster'].to_numpy(), Size=groups['size'].to_numpy())
+
+    # Filing counts grouped by cube dimensions, e.g. by=['Year', 'Application Type (ID)'].
+    # ipc=True counts (record, IPC code) links and allows IPC_Class3/IPC_Section.
+    def counts(self, by, filters=None, ipc=False, snapshot=None):
+        cube = self._cube(ipc, filters, snapshot)
+        by = [by] if isinstance(by, str) else list(by)
+        _check_dims(by, IPC_CUBE_DIMS if ipc else CUBE_DIMS)
+        return rollup(cube, by, 'Count')
+
+    # Strategic map: per IPC class, link count and number of distinct firms
+    def landscape(self, filters=None, snapshot=None):
+        cube = self._cube(True, filters, snapshot)
+        return cube.groupby(['IPC_Section', 'IPC_Class3'], observed=True).agg(Count=('N', 'sum'), Firms=('Firm', 'nunique')).reset_index()
+
+    # Link counts at any IPC level under a code ("B63B", "B63B 22", "H04N 1*"), e.g. by=['Year']
+    def ipc(self, level='IPC_Subclass', under=None, by=(), filters=None, snapshot=None):
+        live = self.dataset(snapshot)
+        by = [by] if isinstance(by, str) else list(by)
+        _check_dims([level], IPC_LEVELS)
+        _check_dims(by, ['Year', 'Application Type (ID)', 'Firm', level])
+        _check_filters(filters, ['Year', 'Application Type (ID)', 'Firm', level])
+        return ipc_counts(live.ipc, live.dataset[2], level, under, by, filters)
+
+    # Rolling monthly filings per entity (IPC_Class3, Firm or Application Type (ID)),
+    # summed or averaged over the window (stat='sum' or 'mean')
+    def trend(self, entity='IPC_Class3', entities=None, types=None, years=None, window=12, stat='sum', snapshot=None):
+        if stat not in ROLLING_STATS: raise ValueError(f"unknown stat '{stat}'; expected any of {list(ROLLING_STATS)}")
+        engine = self._trend(entity, snapshot)
+        counts, labels, _, months = engine.window(types, entities, years)
+        series = ROLLING_STATS[stat](counts.sum(axis=1), int(window))
+        return {'months': [m.strftime('%Y-%m') for m in months], 'series': {str(l): s.tolist() for l, s in zip(labels, series)}}
+
+    # Fastest-growing entities by CAGR over the selected years
+    def growth(self, entity='IPC_Class3', types=None, years=None, min_total=5, top=15, snapshot=None):
+        engine = self._trend(entity, snapshot)
+        counts, labels, _, _ = engine.window(types, None, years)
+        return growth_ranking(counts.sum(axis=1), labels, entity, int(min_total), int(top))
+
+    def _cube(self, ipc, filters, snapshot):
+        cube, ipc_cube = self.dataset(snapshot).cubes
+        cube = ipc_cube if ipc else cube
+        filters = filters or {}
+        _check_filters(filters, IPC_CUBE_DIMS if ipc else CUBE_DIMS)
+        return slice_cube(cube, filters)
+
+    def _trend(self, entity, snapshot):
+        _check_dims([entity], ['IPC_Class3', 'Firm', 'Application Type (ID)'])
+        return self.dataset(snapshot).trend(entity)
+
+def _check_dims(columns, allowed):
+    unknown = [c for c in columns if c not in allowed]
+    if unknown: raise ValueError(f"unknown dimension(s) {unknown}; expected any of {allowed}")
+
+# Filters are {dimension: [values]}; a bare value would reach pandas' isin
+def _check_filters(filters, allowed):
+    filters = filters or {}
+    _check_dims(filters, allowed)
+    scalar = [c for c, values in filters.items() if not isinstance(values, (list, tuple))]
+    if scalar: raise ValueError(f"filter values must be lists: {scalar}")
+
+# --- HTTP/JSON ---
+# POST bodies are JSON objects of the method's keyword arguments; GET query strings work
+# for simple calls (/search?query=hydrogen&limit=10). POST /batch runs a list of
+# {"op": ..., "params": {...}} requests concurrently and returns results in order.
+# Query-string values are typed per parameter below. Lists come from repeated keys
+# (types=5&types=2) or one comma-separated value (years=2020,2021); filters is JSON.
+QUERY_BOOLS = {'ranked', 'ipc'}
+QUERY_INTS = {'limit', 'offset', 'k', 'window', 'min_total', 'top', 'snapshot', 'old', 'new'}
+QUERY_FLOATS = {'threshold'}
+QUERY_LISTS = {'columns': str, 'by': str, 'entities': str, 'types': str, 'years': int}
+QUERY_JSON = {'filters'}
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'off', ''}
+OPS = {
+    'search': KyrixService.search,
+    'counts': KyrixService.counts,
+    'landscape': KyrixService.landscape,
+    'ipc': KyrixService.ipc,
+    'trend': KyrixService.trend,
+    'growth': KyrixService.growth,
+    'similar': KyrixService.similar,
+    'duplicates': KyrixService.duplicates,
+    'snapshots': KyrixService.snapshots,
+    'diff': KyrixService.diff,
+}
+
+def _query_value(name, values):
+    if name in QUERY_LISTS:
+        if len(values) == 1: values = [v for v in values[0].split(',') if v.strip()]
+        return [QUERY_LISTS[name](v.strip()) for v in values]
+    value = values[-1]
+    if name in QUERY_BOOLS:
+        if value.lower() in TRUE_VALUES: return True
+        if value.lower() in FALSE_VALUES: return False
+        raise ValueError(f"'{name}' must be true or false, not '{value}'")
+    if name in QUERY_INTS: return int(value)
+    if name in QUERY_FLOATS: return float(value)
+    if name in QUERY_JSON: return json.loads(value)
+    return value
+
+def _query_params(query):
+    return {k: _query_value(k, v) for k, v in parse_qs(query, keep_blank_values=True).items()}
+
+def _jsonable(value):
+    if isinstance(value, pd.DataFrame):
+        return json.loads(value.to_json(orient='records', date_format='iso'))
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    return value
+
+def _json_default(value):
+    if isinstance(value, np.generic): return value.item()
+    if isinstance(value, np.ndarray): return value.tolist()
+    if isinstance(value, (datetime, date, pd.Timestamp)): return value.isoformat()
+    return str(value)
+
+async def _call(service, op, params):
+    func = OPS.get(op)
+    if func is None: raise LookupError(f"unknown operation '{op}'")
+    if not isinstance(params, dict): raise ValueError("params must be a JSON object")
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, lambda: func(service, **params))
+    return _jsonable(result)
+
+async def _dispatch(service, method, target, body):
+    url = urlsplit(target)
+    op = url.path.strip('/')
+    if op == 'health': return 200, {'status': 'ok'}
+    if method == 'GET':
+        params = _query_params(url.query)
+    else:
+        params = json.loads(body or b'{}')
+    if op == 'batch':
+        requests = params.get('requests', []) if isinstance(params, dict) else params
+        results = await asyncio.gather(*(_call(service, r.get('op'), r.get('params', {})) for r in requests), return_exceptions=True)
+        return 200, [{'error': str(r)} if isinstance(r, Exception) else r for r in results]
+    return 200, await _call(service, op, params)
+
+def _authorized(headers, token):
+    if token is None: return True
+    return hmac.compare_digest(headers.get('authorization', '').encode('utf-8'), f"Bearer {token}".encode('utf-8'))
+
+async def _handle(service, reader, writer, token=None):
+    status, payload = 500, {'error': 'internal error'}
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line: break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY: raise ValueError("request body too large")
+        body = await reader.readexactly(length) if length else b''
+        if len(request_line) < 2: raise ValueError("malformed request")
+        if _authorized(headers, token): status, payload = await _dispatch(service, request_line[0].upper(), request_line[1], body)
+        else: status, payload = 401, {'error': 'missing or wrong bearer token'}
+    except LookupError as e:
+        status, payload = 404, {'error': str(e)}
+    except (ValueError, TypeError, KeyError) as e:
+        status, payload = 400, {'error': str(e)}
+    except Exception as e:
+        status, payload = 500, {'error': str(e)}
+    data = json.dumps(payload, default=_json_default).encode('utf-8')
+    reason = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found'}.get(status, 'Internal Server Error')
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(service=None, host='127.0.0.1', port=8765, token=None):
+    service = service if service is not None else KyrixService()
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w, token), host, port)
+    async with server:
+        await server.serve_forever()
+
+def _is_loopback(host):
+    if host == 'localhost': return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="KYRIX search and analytics over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--token', default=os.environ.get('KYRIX_API_TOKEN'), help="bearer token required on every request (default: $KYRIX_API_TOKEN)")
+    args = parser.parse_args(argv)
+    if not _is_loopback(args.host) and not args.token:
+        parser.error(f"--host {args.host} is not a loopback address; responses include applicant contact details, so set --token or KYRIX_API_TOKEN")
+    service = KyrixService()
+    service.dataset()  # load before accepting requests
+    print(f"KYRIX API on http://{args.host}:{args.port}" + (" (bearer token required)" if args.token else ""))
+    asyncio.run(serve(service, args.host, args.port, args.token or None))
+
+if __name__ == "__main__":
+    main()
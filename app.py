@@ -3,10 +3,15 @@ import pandas as pd
 import os
 import re
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
 import hmac
+import uuid
 from datetime import datetime, timedelta
+from data_store import data_paths
+from snapshots import SnapshotManager
+from analytics import MONTH_NAMES, ROLLING_STATS, slice_cube, rollup, growth_ranking, ipc_counts
+from ipc_hierarchy import IPC_LEVELS, LEVEL_NAMES
+from figure_cache import FigureCache
+from profiler import PROFILE_HISTORY, RerunProfile, log_profile, profile_jsonl
 
 # --- 1. PAGE CONFIG & KYRIX LUXURY THEME ---
 st.set_page_config(
@@ -42,6 +47,15 @@ st.markdown("""
         background-color: #3B82F6 !important;
         color: white !important;
     }
+    label, p, h1, h2, h3, h4, h5, h6, .stMarkdown {
+        color: #F1F5F9 !important;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
+# Tables, tabs, cards and banners of the app itself, injected once past the security gate
+APP_CSS = """
+    <style>
     [data-testid="stDataFrame"], [data-testid="stTable"] {
         background-color: #111827 !important;
         border: 1px solid #1F2937 !important;
@@ -107,9 +121,6 @@ st.markdown("""
         background-color: #F59E0B !important; color: #0F172A !important; padding: 4px 12px; 
         border-radius: 4px; font-weight: 800; font-size: 12px; margin-left: 10px;
     }
-    label, p, h1, h2, h3, h4, h5, h6, .stMarkdown {
-        color: #F1F5F9 !important;
-    }
     .report-box {
         background-color: #020617 !important;
         border: 1px solid #334155 !important;
@@ -119,7 +130,7 @@ st.markdown("""
         margin-bottom: 20px;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
 
 def fix_chart(fig):
     fig.update_layout(
@@ -158,6 +169,55 @@ def parse_year_input(input_str, all_available_years):
     except:
         return all_available_years
 
+# Lazy tabs: when the tab widget tracks state, only the selected tab runs its aggregation and charts.
+# Controls still render in every tab so their state (and selected_firms for Tech-Strengths) survives.
+def tab_active(tab):
+    return tab.open is not False
+
+# Search results render a window at a time: ranked cards per overview page, and rows per
+# grid page (the dossier picks from the grid page), whatever the number of hits
+RESULTS_PER_PAGE = 25
+GRID_PAGE_ROWS = 1000
+
+# 1-based page picker for n items; returns the [start, stop) slice of the chosen page
+def page_window(n, size, label, key):
+    n_pages = max(1, -(-n // size))
+    if n_pages == 1: return 0, n
+    page = min(int(st.number_input(f"{label} (1-{n_pages})", min_value=1, value=1, step=1, key=key)), n_pages)
+    return (page - 1) * size, min(page * size, n)
+
+# Columns listed for similar and near-duplicate filings in the dossier
+SIMILAR_COLUMNS = ['Application Number', 'Title in English', 'Data of Applicant - Legal Name in English', 'Application Date']
+
+# Column as display strings, missing values shown as 'nan' like str() did
+def as_text(col):
+    return col.astype(object).fillna('nan').astype(str)
+
+# Overview cards for one page of ranked results, as a single HTML block
+CARD_COLUMNS = ['Title in English', 'Application Type (ID)', 'Application Number', 'Data of Applicant - Legal Name in English', 'Earliest Priority Date', 'Abstract in English']
+def result_cards(page):
+    cols = [as_text(page[c]) if c in page else ['N/A'] * len(page) for c in CARD_COLUMNS]
+    return "".join(f"""<div class="patent-card"><div class="patent-title">{title}</div><div class="patent-meta"><span class="patent-tag">{app_type}</span><b>App No:</b> {number} | <b>Applicant:</b> {applicant} | <b>Earliest Priority Date:</b> {priority}</div><div class="patent-snippet">{abstract}</div></div>"""
+                   for title, app_type, number, applicant, priority, abstract in zip(*cols))
+
+# Strategic Analysis landing: a snapshot's precomputed summary (analytics.landing_summary),
+# drawn with Streamlit's own charts so it needs neither Plotly nor the loaded frames.
+# It covers every application type; the sidebar's Records Analyzed follows the selection.
+def landing_view(summary):
+    st.markdown('<div class="metric-badge">STRATEGIC LANDSCAPE ENGINE</div>', unsafe_allow_html=True)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Records", f"{summary['records']:,}")
+    m2.metric("Analysis Records (All Types)", f"{summary['analyzed']:,}")
+    latest = summary['latest_filing']
+    m3.metric("Most Recent Filing", pd.Timestamp(latest).strftime('%d %B %Y') if latest else "N/A")
+    m4.metric("Application Types", ", ".join(summary['types']))
+    c1, c2 = st.columns([2, 1])
+    with c1:
+        year_type = pd.DataFrame(summary['year_type'])
+        if not year_type.empty: st.bar_chart(year_type.astype({'Year': str}), x='Year', y='Count', color='Application Type (ID)', height=280)
+    with c2:
+        st.dataframe(pd.DataFrame(summary['top_firms']), use_container_width=True, hide_index=True, height=280)
+
 # Helper to get cutoff dates
 def get_cutoff_dates():
     curr_time = datetime.now()
@@ -175,72 +235,37 @@ def add_cutoff_lines_numeric_axis(fig, c18, c30):
     return fig
 
 # --- 2. DATA & SEARCH ENGINES ---
-def boolean_search(df, query):
-    if not query: return pd.Series([True] * len(df))
-    def check_row(row_str):
-        row_str = row_str.lower()
-        or_parts = query.split(' OR ')
-        or_results = []
-        for part in or_parts:
-            and_parts = part.split(' AND ')
-            and_results = []
-            for sub_part in and_parts:
-                if sub_part.startswith('NOT '):
-                    term = sub_part.replace('NOT ', '').strip().lower()
-                    and_results.append(term not in row_str)
-                else:
-                    term = sub_part.strip().lower()
-                    and_results.append(term in row_str)
-            or_results.append(all(and_results))
-        return any(or_results)
-    combined_series = df.astype(str).apply(lambda x: ' '.join(x), axis=1)
-    return combined_series.apply(check_row)
-
-@st.cache_data
-def load_and_preprocess_all():
-    path = "2026 - 01- 23_ Data Structure for Patent Search and Analysis Engine - Type 5.csv"
-    if not os.path.exists(path) or os.stat(path).st_size == 0: 
-        return pd.DataFrame(), {}, pd.DataFrame(), pd.DataFrame()
-    try:
-        df_raw = pd.read_csv(path, header=0, encoding='utf-8', on_bad_lines='skip')
-        if df_raw.empty: return pd.DataFrame(), {}, pd.DataFrame(), pd.DataFrame()
-        category_row = df_raw.iloc[0] 
-        col_map = {col: str(category_row[col]).strip() for col in df_raw.columns}
-        df_search = df_raw.iloc[1:].reset_index(drop=True).fillna("-")
-        df = df_search.copy()
-        
-        # --- PARSE DATES (Enhanced with dayfirst=True for safety) ---
-        df['AppDate'] = pd.to_datetime(df['Application Date'], errors='coerce', dayfirst=True)
-        df['PriorityDate'] = pd.to_datetime(df['Earliest Priority Date'], errors='coerce', dayfirst=True)
-        
-        # --- CRITICAL FIX: Only drop rows where AppDate is missing ---
-        # Do NOT drop rows if PriorityDate is missing, to preserve Application Counts
-        df_analysis = df.dropna(subset=['AppDate']).copy()
-        
-        if not df_analysis.empty:
-            # --- ANALYSIS YEAR BASED ON APPLICATION DATE (FILING DATE) ---
-            df_analysis['Year'] = df_analysis['AppDate'].dt.year.astype(int)
-            
-            df_analysis['Month_Name'] = df_analysis['AppDate'].dt.month_name()
-            df_analysis['Arrival_Month'] = df_analysis['AppDate'].dt.to_period('M').dt.to_timestamp()
-            
-            # Handle Priority Month (allow NaT)
-            df_analysis['Priority_Month'] = df_analysis['PriorityDate'].dt.to_period('M').dt.to_timestamp()
-            
-            df_analysis['Firm'] = df_analysis['Data of Agent - Name in English'].replace("-", "DIRECT FILING").str.strip().str.upper()
-            df_analysis['IPC_Raw'] = df_analysis['Classification'].astype(str).str.split(',')
-            df_exp = df_analysis.explode('IPC_Raw')
-            df_exp['IPC_Clean'] = df_exp['IPC_Raw'].str.strip().str.upper()
-            df_exp = df_exp[~df_exp['IPC_Clean'].str.contains("NO CLASSIFICATION|NAN|NONE|-", na=False)]
-            df_exp['IPC_Class3'] = df_exp['IPC_Clean'].str[:3] 
-            df_exp['IPC_Section'] = df_exp['IPC_Clean'].str[:1]
-            return df_search, col_map, df_analysis, df_exp
-        else:
-            return df_search, col_map, pd.DataFrame(), pd.DataFrame()
-    except Exception as e:
-        return pd.DataFrame(), {}, pd.DataFrame(), pd.DataFrame()
+# Every extract of the CSV is logged as a snapshot (delta log keyed on Application Number).
+# Loaded snapshots hold frames from the on-disk Arrow cache plus the inverted index, count
+# cubes and trend engines, shared (not copied) across sessions; switching snapshot applies
+# only the records that differ.
+@st.cache_resource
+def get_snapshots():
+    return SnapshotManager()
+
+# Finished Plotly figures shared across sessions (LRU, capped by entry count and estimated size)
+@st.cache_resource
+def get_figure_cache():
+    return FigureCache()
+
+# Plot a figure, rebuilding it only when its normalized inputs (key parts) change.
+# Profiled as build (aggregation + Plotly, on a cache miss) and render (serialization).
+def cached_chart(parts, build):
+    with profile.stage(f"chart.{parts[0]}") as chart:
+        cache = get_figure_cache()
+        misses = cache.misses
+        fig = cache.get((live.snapshot_id,) + parts, lambda: fix_chart(build()))
+        chart['cache'] = 'miss' if cache.misses > misses else 'hit'
+        with profile.stage("chart.render"):
+            st.plotly_chart(fig, use_container_width=True)
 
-df_search, col_map, df_main, df_exp = load_and_preprocess_all()
+# Per-rerun stage timings (profiler.py); KYRIX_ADMIN=1 shows them in a sidebar panel
+PROFILE_PANEL = os.environ.get("KYRIX_ADMIN") == "1"
+profile = RerunProfile(session=st.session_state.setdefault("profile_session", uuid.uuid4().hex[:8]))
+
+def snapshot_label(snapshot_id):
+    entry = snapshots.log.entry(snapshot_id)
+    return f"#{snapshot_id} · {entry['created'][:10]} · {entry['records']} records"
 
 def get_logo():
     for ext in ["png", "jpg", "jpeg"]:
@@ -264,73 +289,120 @@ if not st.session_state.auth:
             else: st.error("INVALID KEY")
         st.markdown('</div>', unsafe_allow_html=True)
 else:
+    # Plotly, the app styles and the dataset load only once a session is authorized
+    import plotly.express as px
+    import plotly.graph_objects as go
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+    snapshots = get_snapshots()
+    with profile.stage("data.ingest"):
+        latest_snapshot = snapshots.log.ingest(data_paths())
+        snapshot_ids = snapshots.log.ids()
+    # Sessions follow the newest extract when one arrives; older snapshots stay selectable
+    if st.session_state.get("snapshot_latest") != latest_snapshot or st.session_state.get("snapshot") not in snapshot_ids:
+        st.session_state["snapshot"] = st.session_state["snapshot_latest"] = latest_snapshot
+
     # --- 4. NAVIGATION & SIDEBAR ---
     with st.sidebar:
         logo = get_logo()
         if logo: st.image(logo)
         st.markdown("## SYSTEM MODE")
         app_mode = st.radio("SELECT VIEW:", ["Intelligence Search", "Strategic Analysis"])
+        if len(snapshot_ids) > 1:
+            st.selectbox("DATA SNAPSHOT:", snapshot_ids[::-1], format_func=snapshot_label, key="snapshot")
+            with st.expander("Compare Snapshots"):
+                base_id = st.selectbox("Compare with:", [i for i in snapshot_ids[::-1] if i != st.session_state["snapshot"]], format_func=snapshot_label, key="snapshot_base")
+                changes = snapshots.log.diff(base_id, st.session_state["snapshot"])
+                st.write(changes['Change'].value_counts().reindex(['Added', 'Changed', 'Removed'], fill_value=0).to_dict())
+                st.dataframe(changes, use_container_width=True, hide_index=True)
         st.markdown("---")
+
+    # While a snapshot's frames load, Strategic Analysis shows its precomputed summary in their place
+    landing = st.empty()
+    if app_mode == "Strategic Analysis" and not snapshots.is_loaded(st.session_state["snapshot"]):
+        summary = snapshots.summary(st.session_state["snapshot"])
+        if summary is not None:
+            with landing.container(): landing_view(summary)
+    with profile.stage("data.load") as stage, st.spinner("Loading dataset..."):
+        live = snapshots.get(st.session_state["snapshot"])
+        df_search, col_map, df_main, df_exp = live.dataset
+        stage['rows'] = len(df_search)
+    landing.empty()
+
+    with st.sidebar:
         if app_mode == "Intelligence Search":
             st.markdown("### GLOBAL COMMAND")
-            global_query = st.text_input("GOOGLE PATENT STYLE SEARCH", placeholder="e.g. AI AND Hydrogen")
+            global_query = st.text_input("GOOGLE PATENT STYLE SEARCH", placeholder='e.g. (AI OR "machine learning") AND title:hydrogen*')
             st.markdown("### FILTERS")
+            # Filters match words that start with each bare term; the global query matches whole words
+            filter_help = 'Matches words starting with each term, ignoring case (H04 finds H04N, smith finds SmithKline). Quote a word or phrase for an exact match; AND, OR, NOT and NEAR/n work as in the global search.'
             field_filters = {}
-            field_filters['Title in English'] = st.text_input("Search in Title")
-            field_filters['Abstract in English'] = st.text_input("Search in Abstract")
+            field_filters['Title in English'] = st.text_input("Search in Title", help=filter_help)
+            field_filters['Abstract in English'] = st.text_input("Search in Abstract", help=filter_help)
             other_fields = ['Application Number', 'Data of Applicant - Legal Name in English', 'Classification']
             for field in other_fields:
-                field_filters[field] = st.text_input(f"{field.split(' - ')[-1]}")
+                field_filters[field] = st.text_input(f"{field.split(' - ')[-1]}", help=filter_help)
             if df_search is not None and not df_search.empty:
                 with st.expander("Show All Other Columns"):
                     for col in df_search.columns:
                         if col not in other_fields and col not in ['Abstract in English', 'Title in English']:
-                            val = st.text_input(col, key=f"ex_{col}")
+                            val = st.text_input(col, key=f"ex_{col}", help=filter_help)
                             if val: field_filters[col] = val
         else:
             st.markdown("### ANALYTICS FILTERS")
             if df_main is not None and not df_main.empty:
                 all_types = sorted(df_main['Application Type (ID)'].unique())
                 selected_types = st.multiselect("Select Application Types:", all_types, default=all_types)
-                df_f = df_main[df_main['Application Type (ID)'].isin(selected_types)]
-                df_exp_f = df_exp[df_exp['Application Type (ID)'].isin(selected_types)]
-                st.success(f"Records Analyzed: {len(df_f)}")
+                with profile.stage("analysis.cubes") as stage:
+                    cube, ipc_cube = live.cubes
+                    cube_f = slice_cube(cube, {'Application Type (ID)': selected_types})
+                    ipc_cube_f = slice_cube(ipc_cube, {'Application Type (ID)': selected_types})
+                    stage['rows'] = len(cube_f) + len(ipc_cube_f)
+                st.success(f"Records Analyzed: {cube_f['N'].sum()}")
+            lazy_tabs = st.checkbox("Render selected tab only", value=True, key="lazy_tabs", help="Skip aggregation and charts for hidden analysis tabs; switching tabs reruns the page.")
         if st.button("RESET SYSTEM"): st.rerun()
+        # Filled in at the end of the run, once this rerun's profile is complete
+        if PROFILE_PANEL: profile_panel = st.container()
 
     # --- 5. MODE: SEARCH ENGINE ---
     if app_mode == "Intelligence Search":
         if df_search is not None and not df_search.empty:
-            mask = boolean_search(df_search, global_query)
-            for field, f_query in field_filters.items():
-                if f_query: mask &= df_search[field].astype(str).str.contains(f_query, case=False, na=False)
-            res = df_search[mask]
-            st.markdown(f'<div class="metric-badge">● {len(res)} IDENTIFIED RECORDS</div>', unsafe_allow_html=True)
-            tab_list, tab_grid, tab_dossier = st.tabs(["SEARCH OVERVIEW", "DATABASE GRID", "PATENT DOSSIER VIEW"])
-            with tab_list:
-                if res.empty: st.info("No records match your query.")
+            # Global query and field filters compile into a single index plan
+            with profile.stage("search.index"):
+                search_index = live.index
+            with profile.stage("search.compile"):
+                plan = search_index.compile(global_query, field_filters)
+            with profile.stage("search.execute") as stage:
+                hits = search_index.execute(plan)
+                stage['rows'] = len(hits)
+            st.markdown(f'<div class="metric-badge">● {len(hits)} IDENTIFIED RECORDS</div>', unsafe_allow_html=True)
+            # Switching tabs reruns, so the dossier's similarity index is only built once it is opened
+            tab_list, tab_grid, tab_dossier = st.tabs(["SEARCH OVERVIEW", "DATABASE GRID", "PATENT DOSSIER VIEW"], key="search_tab", on_change="rerun")
+            with tab_list, profile.stage("search.overview"):
+                if len(hits) == 0: st.info("No records match your query.")
                 else:
-                    for idx, row in res.head(50).iterrows():
-                        st.markdown(f"""
-                        <div class="patent-card">
-                            <div class="patent-title">{row['Title in English']}</div>
-                            <div class="patent-meta">
-                                <span class="patent-tag">{row.get('Application Type (ID)', 'N/A')}</span>
-                                <b>App No:</b> {row['Application Number']} | 
-                                <b>Applicant:</b> {row['Data of Applicant - Legal Name in English']} | 
-                                <b>Earliest Priority Date:</b> {row['Earliest Priority Date']}
-                            </div>
-                            <div class="patent-snippet">{row['Abstract in English']}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-            with tab_grid: st.dataframe(res, use_container_width=True, hide_index=True)
-            with tab_dossier:
-                if res.empty: st.info("No records.")
+                    # Only the hits up to the current page are ranked and rendered
+                    start, stop = page_window(len(hits), RESULTS_PER_PAGE, "Results page", "result_page")
+                    with profile.stage("search.rank", rows=stop):
+                        top_ids, _ = search_index.rank(plan, hits, k=stop)
+                    st.markdown(result_cards(df_search.iloc[top_ids[start:]]), unsafe_allow_html=True)
+            # Grid and dossier send one page of hits (file order), not the whole result set
+            with tab_grid, profile.stage("search.grid") as stage:
+                grid_start, grid_stop = page_window(len(hits), GRID_PAGE_ROWS, "Grid page", "grid_page")
+                window = hits[grid_start:grid_stop]
+                stage['rows'] = len(window)
+                if len(hits) > len(window): st.caption(f"Rows {grid_start + 1:,}-{grid_stop:,} of {len(hits):,}")
+                st.dataframe(df_search.iloc[window], use_container_width=True, hide_index=True)
+            with tab_dossier, profile.stage("search.dossier"):
+                if len(hits) == 0: st.info("No records.")
                 else:
-                    res = res.copy()
-                    res['Display_Label'] = res.apply(lambda x: f"{x['Application Number']} | {str(x['Title in English'])[:50]}...", axis=1)
-                    choice_label = st.selectbox("SELECT PATENT FILE TO DRILL DOWN:", res['Display_Label'].unique())
+                    rows = df_search.iloc[window]
+                    labels = as_text(rows['Application Number']) + " | " + as_text(rows['Title in English']).str[:50] + "..."
+                    choice_label = st.selectbox("SELECT PATENT FILE TO DRILL DOWN:", labels.unique())
                     choice_number = choice_label.split(" | ")[0]
-                    row = res[res['Application Number'] == choice_number].iloc[0]
+                    # Hash lookup of the number's rows; the first one among the hits is shown
+                    positions = live.numbers.get_indexer_for([choice_number])
+                    row_pos = positions[np.isin(positions, window)][0]
+                    row = df_search.iloc[row_pos]
                     st.markdown(f"## {row['Title in English']} <span class='type-badge'>TYPE: {row.get('Application Type (ID)', '-')}</span>", unsafe_allow_html=True)
                     st.markdown('<div class="section-header enriched-banner">Enriched Intelligence Metrics</div>', unsafe_allow_html=True)
                     e_cols = [c for c, t in col_map.items() if t == "Enriched"]
@@ -344,14 +416,28 @@ else:
                         with rc[i%3]: st.markdown(f"<div class='data-card'><div class='label-text'>{c}</div><div class='value-text'>{row[c]}</div></div>", unsafe_allow_html=True)
                     st.markdown('<div class="section-header title-banner">Technical Abstract</div>', unsafe_allow_html=True)
                     st.markdown(f"<div class='abstract-container'>{row['Abstract in English']}</div>", unsafe_allow_html=True)
+                    # Nearest filings by TF-IDF cosine over title + abstract; near duplicates by MinHash
+                    if tab_active(tab_dossier):
+                        st.markdown('<div class="section-header title-banner">Similar Filings</div>', unsafe_allow_html=True)
+                        with profile.stage("search.similar"):
+                            similar_ids, similar_scores = live.similarity.similar(row_pos, k=10)
+                        if len(similar_ids) == 0: st.info("No similar filings.")
+                        else:
+                            similar = df_search.iloc[similar_ids][SIMILAR_COLUMNS]
+                            st.dataframe(similar.assign(Similarity=np.round(similar_scores, 3)), use_container_width=True, hide_index=True)
+                        with profile.stage("search.duplicates"):
+                            duplicates = live.similarity.duplicates(row_pos)
+                        if len(duplicates):
+                            with st.expander(f"Near-Duplicate Filings ({len(duplicates)})"):
+                                st.dataframe(df_search.iloc[duplicates][SIMILAR_COLUMNS], use_container_width=True, hide_index=True)
 
     # --- 6. MODE: STRATEGIC ANALYSIS ENGINE ---
     else:
         if df_main is not None and not df_main.empty:
-            st.markdown('<div class="metric-badge">STRATEGIC LANDSCAPE ENGINE</div>', unsafe_allow_html=True)
-            tabs = st.tabs(["APPLICATION GROWTH", "Firm Intelligence", "Firm Tech-Strengths", "STRATEGIC MAP", "IPC Classification", "Moving Averages", "Monthly Filing", "IPC Growth Histogram"])
+            tabs = st.tabs(["APPLICATION GROWTH", "Firm Intelligence", "Firm Tech-Strengths", "STRATEGIC MAP", "IPC Classification", "Moving Averages", "Monthly Filing", "IPC Growth Histogram"],
+                           key="analysis_tab", on_change="rerun" if lazy_tabs else "ignore")
             
-            with tabs[0]:
+            with tabs[0], profile.stage("tab.growth"):
                 st.markdown("### 📊 Application Growth Intelligence (By Filing Year)")
                 
                 # REPORT BOX TOP
@@ -361,7 +447,7 @@ else:
                             <span style="font-size:12px; color:#94A3B8;">*Vertical lines in charts approximate these dates based on Filing Date.</span></div>""", unsafe_allow_html=True)
 
                 c1, c2 = st.columns([1.5, 1])
-                all_years_growth = sorted(df_f['Year'].unique())
+                all_years_growth = sorted(cube_f['Year'].unique())
                 
                 with c1:
                     mode_growth = st.radio("Year Selection Mode:", ["Type Specific Years", "Select Range"], horizontal=True, key="mode_growth")
@@ -374,60 +460,63 @@ else:
                         sel_years_growth = list(range(s_year, e_year + 1))
 
                 with c2:
-                    all_types_growth = sorted(df_f['Application Type (ID)'].unique())
+                    all_types_growth = sorted(cube_f['Application Type (ID)'].unique())
                     sel_types_growth = st.multiselect("Filter Application Types:", all_types_growth, default=all_types_growth, key="growth_types_sel")
                 
-                df_growth_filtered = df_f[df_f['Year'].isin(sel_years_growth) & df_f['Application Type (ID)'].isin(sel_types_growth)]
+                if tab_active(tabs[0]):
+                    with profile.stage("tab.growth.slice") as stage:
+                        growth_cube = slice_cube(cube_f, {'Year': sel_years_growth, 'Application Type (ID)': sel_types_growth})
+                        stage['rows'] = len(growth_cube)
                 
-                if not df_growth_filtered.empty:
-                    # REINDEX TO ENSURE ALL YEARS PRESENT
-                    growth_year = df_growth_filtered.groupby(['Year', 'Application Type (ID)']).size().reset_index(name='Count')
-                    
-                    # 1. ORIGINAL VERSION (Grouped)
-                    fig_year = px.bar(growth_year, x='Year', y='Count', color='Application Type (ID)', barmode='group', text='Count', title="Annual Application Volume (Grouped View - Filing Date)")
-                    fig_year = add_cutoff_lines_numeric_axis(fig_year, c18, c30)
-                    fig_year = apply_year_axis_formatting(fig_year)
-                    st.plotly_chart(fix_chart(fig_year), use_container_width=True)
+                    if not growth_cube.empty:
+                        # REINDEX TO ENSURE ALL YEARS PRESENT
+                        growth_year = rollup(growth_cube, ['Year', 'Application Type (ID)'], 'Count')
+                        growth_key = (selected_types, sel_years_growth, sel_types_growth, c18.date())
                     
-                    # 2. NEW VERSION (Stacked)
-                    fig_stacked = px.bar(growth_year, x='Year', y='Count', color='Application Type (ID)', barmode='stack', text='Count', title="Annual Application Volume (Stacked/Combined View - Filing Date)")
-                    fig_stacked = add_cutoff_lines_numeric_axis(fig_stacked, c18, c30)
-                    fig_stacked = apply_year_axis_formatting(fig_stacked)
-                    st.plotly_chart(fix_chart(fig_stacked), use_container_width=True)
-
-                    # 3. NEW MONTHLY STACKED BREAKDOWN
-                    st.markdown("### 📅 Monthly Stacked Distribution (Filing Date)")
-                    m_order = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+                        # 1. ORIGINAL VERSION (Grouped)
+                        def build_year():
+                            fig_year = px.bar(growth_year, x='Year', y='Count', color='Application Type (ID)', barmode='group', text='Count', title="Annual Application Volume (Grouped View - Filing Date)")
+                            fig_year = add_cutoff_lines_numeric_axis(fig_year, c18, c30)
+                            return apply_year_axis_formatting(fig_year)
+                        cached_chart(('growth_grouped', growth_key), build_year)
                     
-                    # Sort data for chronological display
-                    df_growth_filtered['Month_Sort'] = df_growth_filtered['Arrival_Month'].dt.month
-                    # Using Month_Name (derived from AppDate)
-                    
-                    monthly_stacked = df_growth_filtered.groupby(['Year', 'Month_Name', 'Application Type (ID)', 'Month_Sort']).size().reset_index(name='Count')
-                    monthly_stacked = monthly_stacked.sort_values(['Year', 'Month_Sort'])
-                    
-                    fig_monthly_stacked = px.bar(monthly_stacked, x='Month_Name', y='Count', color='Application Type (ID)', 
-                                               facet_col='Year', barmode='stack', title="Monthly Combined Volume (Stacked by Filing Year)")
-                    st.plotly_chart(fix_chart(fig_monthly_stacked), use_container_width=True)
+                        # 2. NEW VERSION (Stacked)
+                        def build_stacked():
+                            fig_stacked = px.bar(growth_year, x='Year', y='Count', color='Application Type (ID)', barmode='stack', text='Count', title="Annual Application Volume (Stacked/Combined View - Filing Date)")
+                            fig_stacked = add_cutoff_lines_numeric_axis(fig_stacked, c18, c30)
+                            return apply_year_axis_formatting(fig_stacked)
+                        cached_chart(('growth_stacked', growth_key), build_stacked)
+
+                        # 3. NEW MONTHLY STACKED BREAKDOWN
+                        st.markdown("### 📅 Monthly Stacked Distribution (Filing Date)")
+                        def build_monthly_stacked():
+                            # Sort data for chronological display (Month is the filing-date month number)
+                            monthly_stacked = rollup(growth_cube, ['Year', 'Month', 'Application Type (ID)'], 'Count').rename(columns={'Month': 'Month_Sort'})
+                            monthly_stacked.insert(1, 'Month_Name', [MONTH_NAMES[m - 1] for m in monthly_stacked['Month_Sort']])
+                            monthly_stacked = monthly_stacked.sort_values(['Year', 'Month_Sort'])
+                            return px.bar(monthly_stacked, x='Month_Name', y='Count', color='Application Type (ID)', 
+                                          facet_col='Year', barmode='stack', title="Monthly Combined Volume (Stacked by Filing Year)")
+                        cached_chart(('growth_monthly', growth_key), build_monthly_stacked)
 
-                    st.markdown("---")
-                    st.subheader("Annual Summary Table")
-                    summary_pivot = growth_year.pivot(index='Application Type (ID)', columns='Year', values='Count').fillna(0).astype(int)
-                    summary_pivot['Total'] = summary_pivot.sum(axis=1)
-                    st.dataframe(summary_pivot, use_container_width=True)
+                        st.markdown("---")
+                        st.subheader("Annual Summary Table")
+                        summary_pivot = growth_year.pivot(index='Application Type (ID)', columns='Year', values='Count').fillna(0).astype(int)
+                        summary_pivot['Total'] = summary_pivot.sum(axis=1)
+                        st.dataframe(summary_pivot, use_container_width=True)
 
-                else: st.warning("No data found.")
+                    else: st.warning("No data found.")
 
-            with tabs[1]:
+            with tabs[1], profile.stage("tab.firms"):
                 # REPORT BOX TOP
                 c18, c30 = get_cutoff_dates()
                 st.markdown(f"""<div class="report-box"><h4 style="color:#F59E0B;">📋 PUBLICATION LAG REPORT</h4>
                             Type 4 & 5 Cutoff: <b>{c18.strftime('%d %B %Y')}</b> | Type 1 Cutoff: <b>{c30.strftime('%d %B %Y')}</b></div>""", unsafe_allow_html=True)
                 
-                df_firms_only = df_f[df_f['Firm'] != "DIRECT FILING"]
-                all_firms = sorted(df_firms_only['Firm'].unique())
-                top_firms_list = df_firms_only['Firm'].value_counts().nlargest(10).index.tolist()
-                available_years = sorted(df_firms_only['Year'].unique(), reverse=True)
+                # Firms are resolved entities: spelling variants of one agent count together
+                firms_cube = cube_f[cube_f['Firm'] != "DIRECT FILING"]
+                all_firms = sorted(firms_cube['Firm'].unique())
+                top_firms_list = rollup(firms_cube, 'Firm').nlargest(10, 'N')['Firm'].tolist()
+                available_years = sorted(firms_cube['Year'].unique(), reverse=True)
                 
                 c1, c2 = st.columns([1,1])
                 with c1:
@@ -442,35 +531,62 @@ else:
                         min_y, max_y = min(available_years), max(available_years)
                         s_year, e_year = st.slider("Select Year Range:", min_y, max_y, (min_y, max_y), key="firm_slider")
                         selected_years = list(range(s_year, e_year + 1))
+                aliases = live.aliases
+                firm_variants = aliases[(aliases['Field'] == 'Firm') & (aliases['Alias'] != aliases['Entity'])]
+                if tab_active(tabs[1]) and not firm_variants.empty:
+                    with st.expander(f"Merged Firm Spellings ({len(firm_variants)})"):
+                        st.dataframe(firm_variants[['Alias', 'Entity', 'Records']], use_container_width=True, hide_index=True)
                 
-                if selected_firms and selected_years:
-                    firm_sub = df_firms_only[(df_firms_only['Firm'].isin(selected_firms)) & (df_firms_only['Year'].isin(selected_years))]
+                if tab_active(tabs[1]) and selected_firms and selected_years:
+                    firm_sub = slice_cube(firms_cube, {'Firm': selected_firms, 'Year': selected_years})
                     st.markdown("### Firm Rank by Application Volume")
-                    st.dataframe(firm_sub['Firm'].value_counts().reset_index().rename(columns={'count':'Total Apps'}), use_container_width=True, hide_index=True)
-                    firm_growth = firm_sub.groupby(['Year', 'Firm']).size().reset_index(name='Apps')
-                    fig = px.line(firm_growth, x='Year', y='Apps', color='Firm', markers=True, height=800, title="Firm Filing Intelligence (Expanded View - Filing Date)")
-                    fig = add_cutoff_lines_numeric_axis(fig, c18, c30)
-                    fig = apply_year_axis_formatting(fig)
-                    st.plotly_chart(fix_chart(fig), use_container_width=True)
-
-            with tabs[2]:
-                df_exp_firms_only = df_exp_f[df_exp_f['Firm'] != "DIRECT FILING"]
-                if 'selected_firms' in locals() and selected_firms:
-                    firm_ipc = df_exp_firms_only[df_exp_firms_only['Firm'].isin(selected_firms)].groupby(['Firm', 'IPC_Class3']).size().reset_index(name='Count')
-                    fig = px.bar(firm_ipc, x='Count', y='Firm', color='IPC_Class3', orientation='h', height=600)
-                    st.plotly_chart(fix_chart(fig), use_container_width=True)
-
-            with tabs[3]:
-                land_data = df_exp_f.groupby(['IPC_Section', 'IPC_Class3']).agg({'Application Number':'count', 'Firm':'nunique'}).reset_index()
-                fig = px.scatter(land_data, x='IPC_Section', y='IPC_Class3', size='Application Number', color='Firm', height=600)
-                st.plotly_chart(fix_chart(fig), use_container_width=True)
-
-            with tabs[4]:
-                ipc_counts = df_exp_f.groupby('IPC_Section').size().reset_index(name='Count').sort_values('IPC_Section')
-                fig = px.bar(ipc_counts, x='IPC_Section', y='Count', color='IPC_Section', text='Count', height=600)
-                st.plotly_chart(fix_chart(fig), use_container_width=True)
-
-            with tabs[5]:
+                    st.dataframe(rollup(firm_sub, 'Firm', 'Total Apps').sort_values('Total Apps', ascending=False, kind='stable', ignore_index=True), use_container_width=True, hide_index=True)
+                    def build_firm_growth():
+                        firm_growth = rollup(firm_sub, ['Year', 'Firm'], 'Apps')
+                        fig = px.line(firm_growth, x='Year', y='Apps', color='Firm', markers=True, height=800, title="Firm Filing Intelligence (Expanded View - Filing Date)")
+                        fig = add_cutoff_lines_numeric_axis(fig, c18, c30)
+                        return apply_year_axis_formatting(fig)
+                    cached_chart(('firm_growth', selected_types, selected_firms, selected_years, c18.date()), build_firm_growth)
+
+            with tabs[2], profile.stage("tab.tech_strengths"):
+                if tab_active(tabs[2]) and 'selected_firms' in locals() and selected_firms:
+                    ipc_firms_cube = ipc_cube_f[ipc_cube_f['Firm'] != "DIRECT FILING"]
+                    def build_firm_ipc():
+                        firm_ipc = rollup(slice_cube(ipc_firms_cube, {'Firm': selected_firms}), ['Firm', 'IPC_Class3'], 'Count')
+                        return px.bar(firm_ipc, x='Count', y='Firm', color='IPC_Class3', orientation='h', height=600)
+                    cached_chart(('firm_ipc', selected_types, selected_firms), build_firm_ipc)
+
+            with tabs[3], profile.stage("tab.strategic_map"):
+                if tab_active(tabs[3]):
+                    def build_landscape():
+                        land_data = ipc_cube_f.groupby(['IPC_Section', 'IPC_Class3'], observed=True).agg({'N':'sum', 'Firm':'nunique'}).reset_index().rename(columns={'N': 'Application Number'})
+                        return px.scatter(land_data, x='IPC_Section', y='IPC_Class3', size='Application Number', color='Firm', height=600)
+                    cached_chart(('strategic_map', selected_types), build_landscape)
+
+            with tabs[4], profile.stage("tab.ipc"):
+                if tab_active(tabs[4]):
+                    def build_ipc_sections():
+                        section_counts = rollup(ipc_cube_f, 'IPC_Section', 'Count').sort_values('IPC_Section')
+                        return px.bar(section_counts, x='IPC_Section', y='Count', color='IPC_Section', text='Count', height=600)
+                    cached_chart(('ipc_sections', selected_types), build_ipc_sections)
+                # Drill-down at any IPC level: the code's range of the IPC hierarchy, no string scans
+                st.markdown("### IPC Drill-Down")
+                dc1, dc2 = st.columns(2)
+                with dc1: drill_under = st.text_input("Under IPC Code (e.g. B63B, B63B 22, H04N 1*):", key="ipc_under")
+                with dc2: drill_level = st.selectbox("Break Down By:", IPC_LEVELS[1:], index=1, format_func=LEVEL_NAMES.get, key="ipc_level")
+                if tab_active(tabs[4]):
+                    with profile.stage("tab.ipc.drill") as stage:
+                        drill = ipc_counts(live.ipc, df_main, drill_level, drill_under, filters={'Application Type (ID)': selected_types})
+                        drill = drill.sort_values('Count', ascending=False, kind='stable').head(40)
+                        stage['rows'] = len(drill)
+                    if drill.empty: st.info("No IPC codes under this code.")
+                    else:
+                        def build_ipc_drill():
+                            fig = px.bar(drill.astype({drill_level: str}), x=drill_level, y='Count', text='Count', height=600, labels={drill_level: LEVEL_NAMES[drill_level]})
+                            return fig.update_xaxes(type='category')
+                        cached_chart(('ipc_drill', selected_types, drill_under.strip().upper(), drill_level), build_ipc_drill)
+
+            with tabs[5], profile.stage("tab.moving_averages"):
                 most_recent_date = df_main['AppDate'].max()
                 date_str = most_recent_date.strftime('%d %B %Y') if pd.notnull(most_recent_date) else "N/A"
                 st.markdown(f'<div class="metric-badge" style="padding:10px 20px; font-size:16px;">Most Recent Filing Date: {date_str}</div>', unsafe_allow_html=True)
@@ -480,11 +596,15 @@ else:
                 st.markdown(f"""<div class="report-box"><h4 style="color:#F59E0B;">📋 PUBLICATION LAG REPORT</h4>
                             Type 4 & 5 Cutoff: <b>{c18.strftime('%d %B %Y')}</b> | Type 1 Cutoff: <b>{c30.strftime('%d %B %Y')}</b></div>""", unsafe_allow_html=True)
 
-                unique_3char = sorted(df_exp_f['IPC_Class3'].unique())
-                all_av_years = sorted(df_f['Year'].unique())
+                unique_3char = sorted(ipc_cube_f['IPC_Class3'].unique())
+                all_av_years = sorted(cube_f['Year'].unique())
                 
                 c1, c2, c3 = st.columns(3)
-                with c1: target_ipc = st.selectbox("IPC Class (3-Digit):", ["ALL IPC"] + unique_3char, key="ma_ipc")
+                with c1:
+                    target_ipc = st.selectbox("IPC Class (3-Digit):", ["ALL IPC"] + unique_3char, key="ma_ipc")
+                    ma_window = st.slider("Rolling Window (Months):", 1, 36, 12, key="ma_window")
+                    ma_stat = st.radio("Rolling Statistic:", ["Sum", "Mean"], horizontal=True, key="ma_stat")
+                    rolling = ROLLING_STATS[ma_stat.lower()]
                 with c2:
                     mode_ma = st.radio("Year Selection Mode:", ["Type Specific Years", "Select Range"], horizontal=True, key="mode_ma")
                     if mode_ma == "Type Specific Years":
@@ -495,40 +615,63 @@ else:
                         s_year, e_year = st.slider("Select Year Range:", min_y, max_y, (min_y, max_y), key="ma_slider")
                         ma_years = list(range(s_year, e_year + 1))
                 with c3:
-                    all_av_types = sorted(df_f['Application Type (ID)'].unique())
+                    all_av_types = sorted(cube_f['Application Type (ID)'].unique())
                     sel_ma_types = st.multiselect("Visible Types:", all_av_types, default=all_av_types)
                 
-                analysis_df = df_exp_f.copy() if target_ipc == "ALL IPC" else df_exp_f[df_exp_f['IPC_Class3'] == target_ipc]
-                work_df = df_f.copy() if target_ipc == "ALL IPC" else df_f[df_f['Application Number'].isin(analysis_df['Application Number'].unique())]
-                work_df = work_df[(work_df['Year'].isin(ma_years)) & (work_df['Application Type (ID)'].isin(sel_ma_types))]
-                analysis_df = analysis_df[(analysis_df['Year'].isin(ma_years)) & (analysis_df['Application Type (ID)'].isin(sel_ma_types))]
-                
-                if not work_df.empty:
-                    f_range = pd.date_range(start=f"{min(ma_years)}-01-01", end=f"{max(ma_years)}-12-31", freq='MS')
-                    t_counts = analysis_df.groupby(['Arrival_Month', 'Application Type (ID)']).size().reset_index(name='N')
-                    t_pivot = t_counts.pivot(index='Arrival_Month', columns='Application Type (ID)', values='N').fillna(0)
-                    t_ma = t_pivot.reindex(f_range, fill_value=0).rolling(window=12, min_periods=1).sum()
-                    fig = go.Figure()
-                    for col in t_ma.columns:
-                        fig.add_trace(go.Scatter(x=t_ma.index, y=t_ma[col], mode='lines', line=dict(shape='spline', width=3), name=f'Type: {col}', fill='tozeroy'))
+                if tab_active(tabs[5]):
+                    with profile.stage("tab.moving_averages.window"):
+                        ipc_trend = live.trend('IPC_Class3')
+                        ma_counts, _, ma_types, ma_months = ipc_trend.window(sel_ma_types, None if target_ipc == "ALL IPC" else [target_ipc], ma_years)
                     
-                    fig.add_vline(x=c18.timestamp() * 1000, line_width=2, line_dash="dash", line_color="#F59E0B")
-                    fig.add_vline(x=c30.timestamp() * 1000, line_width=2, line_dash="dash", line_color="#EF4444")
-                    st.plotly_chart(fix_chart(fig), use_container_width=True)
-                else: st.warning("Insufficient data.")
-
-            with tabs[6]:
-                sel_yr_m = st.selectbox("Choose Year:", sorted(df_f['Year'].unique(), reverse=True), key="m_tab_sel")
-                yr_data = df_f[df_f['Year'] == sel_yr_m]
-                m_order = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
-                counts = yr_data.groupby('Month_Name').size().reindex(m_order, fill_value=0).reset_index(name='Apps')
-                fig = px.bar(counts, x='Month_Name', y='Apps', text='Apps', height=600)
-                st.plotly_chart(fix_chart(fig), use_container_width=True)
-
-            with tabs[7]:
+                    if ma_counts.any():
+                        def build_moving_average():
+                            per_type = ma_counts.sum(axis=0)
+                            t_ma = rolling(per_type, ma_window)
+                            fig = go.Figure()
+                            for col, series, raw in zip(ma_types, t_ma, per_type):
+                                if raw.any(): fig.add_trace(go.Scatter(x=ma_months, y=series, mode='lines', line=dict(shape='spline', width=3), name=f'Type: {col}', fill='tozeroy'))
+                            
+                            fig.add_vline(x=c18.timestamp() * 1000, line_width=2, line_dash="dash", line_color="#F59E0B")
+                            fig.add_vline(x=c30.timestamp() * 1000, line_width=2, line_dash="dash", line_color="#EF4444")
+                            return fig
+                        cached_chart(('moving_average', selected_types, target_ipc, ma_years, sel_ma_types, ma_window, ma_stat, c18.date()), build_moving_average)
+
+                        # FASTEST GROWING CLASSES + MULTI-CLASS COMPARISON (same engine, all classes in one pass)
+                        st.markdown("### 🚀 Fastest Growing IPC Classes (CAGR over selected years)")
+                        with profile.stage("tab.moving_averages.ranking") as stage:
+                            all_counts, ipc_labels, _, _ = ipc_trend.window(sel_ma_types, None, ma_years)
+                            ranking = growth_ranking(all_counts.sum(axis=1), ipc_labels, 'IPC_Class3')
+                            stage['rows'] = len(ranking)
+                        st.dataframe(ranking, use_container_width=True, hide_index=True)
+                        compare_ipc = st.multiselect("Compare IPC Classes:", list(ipc_labels), default=ranking['IPC_Class3'].head(3).tolist(), key="ma_compare")
+                        if compare_ipc:
+                            def build_ipc_compare():
+                                cmp_counts, cmp_labels, _, cmp_months = ipc_trend.window(sel_ma_types, compare_ipc, ma_years)
+                                fig = go.Figure()
+                                for label, series in zip(cmp_labels, rolling(cmp_counts.sum(axis=1), ma_window)):
+                                    fig.add_trace(go.Scatter(x=cmp_months, y=series, mode='lines', line=dict(shape='spline', width=3), name=f'IPC: {label}'))
+                                fig.update_layout(title=f"Rolling {ma_window}-Month {ma_stat} of Filings by IPC Class")
+                                return fig
+                            cached_chart(('ipc_compare', selected_types, tuple(compare_ipc), ma_years, sel_ma_types, ma_window, ma_stat), build_ipc_compare)
+                    else: st.warning("Insufficient data.")
+
+            with tabs[6], profile.stage("tab.monthly"):
+                sel_yr_m = st.selectbox("Choose Year:", sorted(cube_f['Year'].unique(), reverse=True), key="m_tab_sel")
+                if tab_active(tabs[6]):
+                    def build_monthly():
+                        yr_data = cube_f[cube_f['Year'] == sel_yr_m]
+                        counts = yr_data.groupby('Month')['N'].sum().reindex(range(1, 13), fill_value=0)
+                        counts = pd.DataFrame({'Month_Name': MONTH_NAMES, 'Apps': counts.to_numpy()})
+                        return px.bar(counts, x='Month_Name', y='Apps', text='Apps', height=600)
+                    cached_chart(('monthly_filing', selected_types, sel_yr_m), build_monthly)
+
+            with tabs[7], profile.stage("tab.ipc_histogram"):
                 st.markdown("### IPC Growth Histogram (Filing Date)")
-                u_ipc_list = sorted(df_exp_f['IPC_Class3'].unique())
-                a_yrs_hist = sorted(df_exp_f['Year'].unique())
+                h_level = st.selectbox("IPC Level:", IPC_LEVELS[1:4], format_func=LEVEL_NAMES.get, key="hist_level")
+                # 3-digit classes come from the cube; deeper levels are the IPC hierarchy's labels
+                if h_level == 'IPC_Class3': u_ipc_list = sorted(ipc_cube_f['IPC_Class3'].unique())
+                else: u_ipc_list = list(live.ipc.nodes(h_level).astype(str))
+                a_yrs_hist = sorted(ipc_cube_f['Year'].unique())
                 hc1, hc2 = st.columns(2)
                 with hc1:
                     a_ipc_trig = st.checkbox("SELECT ALL IPC")
@@ -536,12 +679,36 @@ else:
                 with hc2:
                     h_yrs_input = st.text_input("Type Years for IPC Histogram:", value=", ".join(map(str, a_yrs_hist)))
                     h_yrs = parse_year_input(h_yrs_input, a_yrs_hist)
-                if s_ipc_hist and h_yrs:
-                    h_data = df_exp_f[(df_exp_f['IPC_Class3'].isin(s_ipc_hist)) & (df_exp_f['Year'].isin(h_yrs))]
-                    h_growth = h_data.groupby(['Year', 'IPC_Class3']).size().reset_index(name='Apps')
-                    fig_h = px.bar(h_growth, x='Year', y='Apps', color='IPC_Class3', barmode='group', text='Apps', height=600)
-                    fig_h = apply_year_axis_formatting(fig_h)
-                    st.plotly_chart(fix_chart(fig_h), use_container_width=True)
-                    st.dataframe(h_growth.pivot(index='IPC_Class3', columns='Year', values='Apps').fillna(0).astype(int), use_container_width=True)
+                if tab_active(tabs[7]) and s_ipc_hist and h_yrs:
+                    with profile.stage("tab.ipc_histogram.counts") as stage:
+                        if h_level == 'IPC_Class3':
+                            h_data = slice_cube(ipc_cube_f, {'IPC_Class3': s_ipc_hist, 'Year': h_yrs})
+                            h_growth = rollup(h_data, ['Year', 'IPC_Class3'], 'Apps')
+                        else:
+                            h_growth = ipc_counts(live.ipc, df_main, h_level, by=['Year'], filters={'Application Type (ID)': selected_types, 'Year': h_yrs, h_level: s_ipc_hist}, name='Apps')
+                        stage['rows'] = len(h_growth)
+                    def build_ipc_histogram():
+                        fig_h = px.bar(h_growth, x='Year', y='Apps', color=h_level, barmode='group', text='Apps', height=600)
+                        return apply_year_axis_formatting(fig_h)
+                    cached_chart(('ipc_histogram', selected_types, h_level, tuple(s_ipc_hist), h_yrs), build_ipc_histogram)
+                    st.dataframe(h_growth.pivot(index=h_level, columns='Year', values='Apps').fillna(0).astype(int), use_container_width=True)
         else:
             st.error("No valid data found.")
+
+# --- 7. RERUN PROFILE ---
+# Logged as one JSON line per rerun; the admin panel shows this rerun and the session's history
+profile_record = profile.finish(mode=app_mode if st.session_state.auth else "login")
+log_profile(profile_record)
+profile_history = st.session_state.setdefault("profile_history", [])
+profile_history.append(profile_record)
+del profile_history[:-PROFILE_HISTORY]
+if st.session_state.auth and PROFILE_PANEL:
+    with profile_panel, st.expander("⏱ RERUN PROFILE"):
+        st.caption(f"{profile_record['total_ms']:,.0f} ms · RSS {profile_record['rss_mb'] or 0:,.0f} MB ({profile_record['rss_delta_mb'] or 0:+,.1f})")
+        stages = pd.DataFrame(profile_record['stages'])
+        if not stages.empty:
+            stages['stage'] = ["· " * d + n for d, n in zip(stages.pop('depth'), stages['stage'])]
+            st.dataframe(stages, use_container_width=True, hide_index=True)
+        history = pd.DataFrame([{'time': r['time'][11:19], 'mode': r['mode'], 'total_ms': r['total_ms'], 'rss_mb': r['rss_mb']} for r in profile_history])
+        st.dataframe(history.iloc[::-1], use_container_width=True, hide_index=True)
+        st.download_button("Export profile log (JSONL)", profile_jsonl(profile_history), file_name="kyrix_profile.jsonl", mime="application/json")
@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import shutil
+import time
+import platform
+import argparse
+import tempfile
+import resource
+import tracemalloc
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_store import load_dataset, read_cache, cache_path, sources_hash
+from snapshots import LiveDataset
+from search_engine import InvertedIndex
+from analytics import CUBE_DIMS, IPC_CUBE_DIMS, build_cubes, slice_cube, rollup, ipc_counts, TrendEngine, rolling_sum, growth_ranking
+from entities import build_aliases, resolve_cube
+from ipc_hierarchy import IpcHierarchy
+from similarity import SimilarityIndex
+from synth import generate
+
+# --- KYRIX BENCHMARK ---
+# Times the load, search and Strategic Analysis paths on synthetic extracts (synth.py) of
+# several sizes, or on given extracts. Each stage runs --repeat times and keeps the best
+# time; one more run under tracemalloc records its peak Python/NumPy allocation (Arrow
+# buffers are not traced). Every size runs in a fresh process so its peak RSS is its own.
+# With --baseline, stages slower than the earlier results by --tolerance fail the run.
+#   python benchmark.py [--sizes 10000 100000] [--repeat 3] [--json out.json] [--baseline old.json]
+#   python benchmark.py extract.csv ...
+
+DEFAULT_SIZES = [10_000, 100_000]
+# Stages faster than this are never reported as regressions (timer noise)
+MIN_REGRESSION_SECONDS = 0.01
+
+# Query shapes: name -> (global query, field filters). Words come from synth.py's vocabulary.
+QUERIES = {
+    'term': ('pump', {}),
+    'and': ('solar AND panel', {}),
+    'or': ('battery OR electrode OR charging', {}),
+    'not': ('engine NOT turbine', {}),
+    'phrase': ('"heat exchanger"', {}),
+    'prefix': ('therm* OR semicon*', {}),
+    'near': ('drilling NEAR/5 wellbore', {}),
+    'field': ('title:vessel', {}),
+    'filters': ('', {'Title in English': 'valve', 'Data of Agent - Name in English': 'gulf'}),
+    'complex': ('(hydrogen OR catalyst) AND NOT steel AND abstract:synth*', {'Data of Applicant - Legal Name in English': 'energy'}),
+}
+RANK_K = 25
+
+# Stage runner: best-of-N seconds, then one traced run for peak allocation.
+# setup() runs before every repetition (untimed) and its result is passed to func.
+class Bench:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, func, setup=None):
+        best, out = float('inf'), None
+        for _ in range(self.repeat):
+            arg = setup() if setup else None
+            started = time.perf_counter()
+            out = func(arg) if setup else func()
+            best = min(best, time.perf_counter() - started)
+        arg = setup() if setup else None
+        tracemalloc.start()
+        func(arg) if setup else func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.results[name] = {'seconds': round(best, 5), 'peak_mb': round(peak / 2 ** 20, 2)}
+        return out
+
+# Every stage for one extract set; returns {stage: {...}} plus the dataset size and peak RSS
+def run_paths(paths, repeat):
+    bench = Bench(repeat)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # --- LOAD: CSV -> preprocessed Arrow cache and index, then the cached read every server start does ---
+        target = cache_path(sources_hash(paths), cache_dir)
+        bench.run('load.csv', lambda _: load_dataset(paths, cache_dir), lambda: shutil.rmtree(target, ignore_errors=True))
+        dataset = bench.run('load.cache', lambda: read_cache(target))
+        df_search, _, df_analysis, df_exp = dataset
+
+        # --- SEARCH: index build/save/load, then each query shape (plan + execute) and ranking ---
+        index = bench.run('index.build', lambda: InvertedIndex(df_search))
+        index_path = os.path.join(cache_dir, 'index.npz')
+        index.save(index_path)
+        bench.run('index.load', lambda: InvertedIndex.load(index_path))
+        hits = {}
+        for shape, (query, filters) in QUERIES.items():
+            plan = index.compile(query, filters)
+            hits[shape] = bench.run(f"search.{shape}", lambda: index.execute(index.compile(query, filters)))
+            bench.results[f"search.{shape}"]['hits'] = int(len(hits[shape]))
+            bench.run(f"rank.{shape}", lambda: index.rank(plan, hits[shape], k=RANK_K))
+
+        # --- STRATEGIC ANALYSIS: cubes and entities, then what each tab computes ---
+        raw_cubes = bench.run('cubes.build', lambda: build_cubes(df_analysis, df_exp))
+        aliases = bench.run('entities.build', lambda: build_aliases(df_analysis))
+        cube, ipc_cube = bench.run('cubes.resolve', lambda: tuple(resolve_cube(c, aliases, dims) for c, dims in zip(raw_cubes, (CUBE_DIMS, IPC_CUBE_DIMS))))
+        types = sorted(df_analysis['Application Type (ID)'].unique())
+        years = sorted(cube['Year'].unique())
+        recent = years[-10:]
+        cube_f = slice_cube(cube, {'Application Type (ID)': types})
+        ipc_cube_f = slice_cube(ipc_cube, {'Application Type (ID)': types})
+        bench.run('tab.growth', lambda: (rollup(cube_f, ['Year', 'Application Type (ID)'], 'Count'), rollup(cube_f, ['Year', 'Month', 'Application Type (ID)'], 'Count')))
+        firms = rollup(cube_f, 'Firm').nlargest(10, 'N')['Firm'].tolist()
+        bench.run('tab.firms', lambda: rollup(slice_cube(cube_f, {'Firm': firms, 'Year': recent}), ['Year', 'Firm'], 'Apps'))
+        bench.run('tab.tech_strengths', lambda: rollup(slice_cube(ipc_cube_f, {'Firm': firms}), ['Firm', 'IPC_Class3'], 'Count'))
+        bench.run('tab.landscape', lambda: ipc_cube_f.groupby(['IPC_Section', 'IPC_Class3'], observed=True).agg({'N': 'sum', 'Firm': 'nunique'}).reset_index())
+        bench.run('tab.ipc_sections', lambda: rollup(ipc_cube_f, 'IPC_Section', 'Count'))
+        hierarchy = bench.run('ipc.build', lambda: IpcHierarchy(df_exp['IPC_Clean'], df_exp['row_id']))
+        subclasses = ipc_counts(hierarchy, df_analysis, 'IPC_Subclass').nlargest(5, 'Count')['IPC_Subclass'].astype(str).tolist()
+        bench.run('tab.ipc_drill', lambda: ipc_counts(hierarchy, df_analysis, 'IPC_Group', subclasses[0] if subclasses else None, filters={'Application Type (ID)': types}))
+        engine = bench.run('trend.build', lambda: TrendEngine(ipc_cube, 'IPC_Class3'))
+        def moving_averages():
+            counts, labels, _, _ = engine.window(types, None, recent)
+            return rolling_sum(counts.sum(axis=1), 12), growth_ranking(counts.sum(axis=1), labels, 'IPC_Class3')
+        bench.run('tab.moving_averages', moving_averages)
+        bench.run('tab.monthly', lambda: slice_cube(cube_f, {'Year': [years[-1]]}).groupby('Month')['N'].sum().reindex(range(1, 13), fill_value=0))
+        bench.run('tab.histogram', lambda: ipc_counts(hierarchy, df_analysis, 'IPC_Subclass', by=['Year'], filters={'Application Type (ID)': types, 'Year': recent, 'IPC_Subclass': subclasses}, name='Apps'))
+
+        # --- DOSSIER: similar filings and near-duplicate groups ---
+        similarity = bench.run('similarity.build', lambda: SimilarityIndex(index))
+        rows = np.linspace(0, len(df_search) - 1, 20).astype(int)
+        bench.run('similarity.similar', lambda: [similarity.similar(r, 10) for r in rows])
+        bench.run('similarity.clusters', lambda s: s.clusters(), lambda: SimilarityIndex(index))
+
+        # --- WHOLE DATASET: the lazy LiveDataset path the app takes on a cold start ---
+        bench.run('live.cold_start', lambda: LiveDataset(read_cache(target)).cubes)
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'records': int(len(df_search)),
+        'links': int(len(df_exp)),
+        'peak_rss_mb': round(usage / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1),
+        'stages': bench.results,
+    }
+
+# One synthetic size: the extract is generated once per (rows, seed) in data_dir and reused
+def run_size(rows, seed, repeat, data_dir):
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic-{rows}-s{seed}.csv")
+    if not os.path.exists(path): generate(path, rows, seed)
+    return run_paths([path], repeat)
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, run in results.items():
+        before = baseline.get('runs', {}).get(size, {}).get('stages', {})
+        for stage, r in run['stages'].items():
+            old = before.get(stage)
+            if old is None: continue
+            if r['seconds'] > old['seconds'] * tolerance and r['seconds'] - old['seconds'] > MIN_REGRESSION_SECONDS:
+                regressions.append((size, stage, old['seconds'], r['seconds']))
+    return regressions
+
+def report(label, run):
+    print(f"\n== {label}: {run['records']:,} records, {run['links']:,} IPC links, peak RSS {run['peak_rss_mb']:,.0f} MB")
+    print(f"{'stage':<26}{'seconds':>10}{'peak MB':>10}")
+    for stage, r in run['stages'].items():
+        hits = f"  ({r['hits']:,} hits)" if 'hits' in r else ''
+        print(f"{stage:<26}{r['seconds']:>10.4f}{r['peak_mb']:>10.1f}{hits}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark KYRIX load, search and analytics.")
+    parser.add_argument('paths', nargs='*', help="extracts to benchmark instead of synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="synthetic record counts")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument('--data-dir', default=tempfile.gettempdir(), help="where synthetic extracts are written and reused")
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--baseline', help="earlier --json results to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    runs = {}
+    for size in ([None] if args.paths else args.sizes):
+        label = ', '.join(os.path.basename(p) for p in args.paths) if size is None else str(size)
+        # A fresh process per size keeps peak RSS (and allocator state) per dataset
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            if size is None: runs[label] = pool.submit(run_paths, args.paths, args.repeat).result()
+            else: runs[label] = pool.submit(run_size, size, args.seed, args.repeat, args.data_dir).result()
+        report(label, runs[label])
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                        'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'repeat': args.repeat,
+        'runs': runs,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(runs, json.load(f), args.tolerance)
+        for size, stage, old, new in regressions:
+            print(f"REGRESSION {size} {stage}: {old:.4f}s -> {new:.4f}s ({new / old:.2f}x)")
+        if regressions: return 1
+        print(f"\nNo stage slower than {args.tolerance:.2f}x the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
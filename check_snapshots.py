@@ -0,0 +1,124 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from data_store import INDEX_FILE, cache_path, load_dataset, read_cache
+from search_engine import InvertedIndex
+from snapshots import LiveDataset, SnapshotLog, SnapshotManager
+from synth import generate
+
+# --- KYRIX SNAPSHOT CHECK ---
+# Logs snapshot A (a synthetic extract) and B (A with records changed, removed, added and
+# repeated, so '#n' keys shift), switches a loaded A to B and asserts that the frames and
+# every posting array equal a fresh load of B. C is B with its rows shuffled, which takes
+# the re-sorting path of the index delta. Only A is cached by ingest: each switch must
+# write its target's cache, which a cold start then reads. Runs in a temporary directory.
+#   python check_snapshots.py [--rows 5000] [--seed 0]
+
+APPNO = 'Application Number'
+TITLE = 'Title in English'
+
+# Records of A edited into B: every 50th title changed, every 70th record removed, a new
+# filing inserted every 90 records and every 110th record repeated right after itself
+def edit_extract(raw):
+    category_row, body = raw.iloc[:1], raw.iloc[1:].reset_index(drop=True)
+    pos = np.arange(len(body))
+    body.loc[pos % 50 == 7, TITLE] = body.loc[pos % 50 == 7, TITLE] + ' revised'
+    # A repeated application number: change its second occurrence only
+    repeated = body[APPNO].duplicated()
+    if repeated.any(): body.loc[repeated.idxmax(), TITLE] = 'changed repeat'
+    parts = []
+    for i, row in body.iterrows():
+        if i % 70 == 3: continue
+        parts.append(row)
+        if i % 110 == 5: parts.append(row)
+        if i % 90 == 11:
+            added = row.copy()
+            added[APPNO] = f"PX{i}/2099"
+            parts.append(added)
+    return pd.concat([category_row, pd.DataFrame(parts)], ignore_index=True)
+
+def same_frames(live, fresh):
+    for got, want in zip(live.dataset[:1] + live.dataset[2:], fresh[:1] + fresh[2:]):
+        assert_frame_equal(got, want)
+    assert live.dataset[1] == fresh[1]
+
+def same_index(index, fresh):
+    assert index.columns == fresh.columns and index.n_rows == fresh.n_rows
+    for col in fresh.columns:
+        a, b = index.fields[col], fresh.fields[col]
+        for name in ('keys', 'key_bounds', 'rows', 'bounds', 'tf', 'vocab'):
+            x, y = getattr(a, name), getattr(b, name)
+            assert (x is None and y is None) or np.array_equal(x, y), f"{col}: {name}"
+    for col, lens in fresh.doc_lens.items():
+        assert np.array_equal(index.doc_lens[col], lens) and index.avg_lens[col] == fresh.avg_lens[col], col
+
+# Switch `live` to the snapshot of `path` and compare with a fresh load of that extract
+def check_switch(live, log, snapshot_id, path, fresh_dir):
+    nxt = live.switch(log, snapshot_id)
+    fresh = load_dataset([path], fresh_dir)
+    same_frames(nxt, fresh)
+    same_index(nxt.index, InvertedIndex(fresh[0]))
+    # The switched dataset writes the target's cache: its frames and its index
+    target = cache_path(log.entry(snapshot_id)['hash'])
+    assert nxt.cache_dir == target
+    same_frames(LiveDataset(read_cache(target)), fresh)
+    same_index(InvertedIndex.load(os.path.join(target, INDEX_FILE)), nxt.index)
+    return nxt
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check snapshot switches against fresh loads.")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work:
+        os.chdir(work)
+        try:
+            paths = {name: os.path.join(work, f"{name}.csv") for name in 'ABC'}
+            generate(paths['A'], args.rows, args.seed)
+            raw = pd.read_csv(paths['A'], dtype=str, keep_default_na=False)
+            b = edit_extract(raw)
+            b.to_csv(paths['B'], index=False)
+            body = b.iloc[1:].sample(frac=1, random_state=args.seed)
+            pd.concat([b.iloc[:1], body]).to_csv(paths['C'], index=False)
+
+            log = SnapshotLog()
+            ids = {name: log.ingest([path]) for name, path in paths.items()}
+            for name in 'BC':
+                e = log.entry(ids[name])
+                print(f"{name}: {e['records']} records, {e['added']} added, {e['changed']} changed, {e['removed']} removed")
+            assert log.entry(ids['B'])['changed'] and log.entry(ids['B'])['removed'] and log.entry(ids['B'])['added']
+            keys, _ = log.keys(ids['B'])
+            assert any('#' in k for k in keys), "no repeated application numbers"
+
+            # Only the first snapshot is cached by ingest; the switches write B's and C's caches
+            for name in 'BC':
+                assert not os.path.exists(cache_path(log.entry(ids[name])['hash'])), f"{name} cached by ingest"
+            live = SnapshotManager(log).get(ids['A'])
+            live.index
+            live = check_switch(live, log, ids['B'], paths['B'], os.path.join(work, 'fresh'))
+            print("A -> B: frames and postings match a fresh load")
+            check_switch(live, log, ids['C'], paths['C'], os.path.join(work, 'fresh'))
+            print("B -> C (reordered): frames and postings match a fresh load")
+
+            # Cold starts: C from the cache its switch wrote, then (cache removed) by a switch
+            # from B, the newest earlier snapshot with a cache
+            fresh = load_dataset([paths['C']], os.path.join(work, 'fresh'))
+            same_frames(SnapshotManager(log).get(ids['C']), fresh)
+            shutil.rmtree(cache_path(log.entry(ids['C'])['hash']))
+            cold = SnapshotManager(log).get(ids['C'])
+            same_frames(cold, fresh)
+            assert os.path.isdir(cold.cache_dir)
+            print("cold start of C: from its cache, and switched from B's")
+        finally:
+            os.chdir(cwd)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
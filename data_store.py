@@ -0,0 +1,272 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+from collections import deque
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from search_engine import InvertedIndex
+
+# --- KYRIX DATA STORE ---
+# CSV extracts -> preprocessed frames, persisted as memory-mapped Arrow (Feather) files
+# keyed by a hash of the source CSVs, so new server processes skip the parse. CSVs are
+# read and preprocessed in chunks written straight to the cache, so peak memory is one
+# chunk plus the finished frames (which are memory-mapped from disk). The search index is
+# built the same way, one chunk at a time, and saved with the frames.
+
+# One extract per application type, same layout; all of them are loaded together
+DATA_PATTERN = "2026 - 01- 23_ Data Structure for Patent Search and Analysis Engine - Type *.csv"
+CACHE_DIR = ".kyrix_cache"
+# Bump whenever preprocess() output or the saved index layout changes so stale caches are rebuilt
+CACHE_VERSION = 6
+CHUNK_ROWS = 10_000
+# Chunks handed to a process pool ahead of the writer (bounds memory in prep mode)
+PENDING_CHUNKS = 2 * (os.cpu_count() or 1)
+# Saved InvertedIndex, next to the frames it indexes
+INDEX_FILE = "index.npz"
+# Firm alias table (entities.py), also next to the frames
+ENTITY_FILE = "entities.feather"
+# Landing summary of the Strategic Analysis view (analytics.landing_summary), read before the frames
+SUMMARY_FILE = "summary.json"
+FRAMES = ['df_search', 'df_analysis', 'df_exp']
+
+# Low-cardinality text columns stored as categoricals (one copy of each distinct name)
+CATEGORY_COLUMNS = ['Application Type (ID)', 'Country Name (Priority)', 'Data of Applicant - Legal Name in English']
+# df_analysis keeps only what the Strategic Analysis engine reads; text stays in df_search (same index)
+ANALYSIS_COLUMNS = ['Application Number', 'Application Type (ID)', 'Data of Applicant - Legal Name in English', 'Data of Agent - Name in English']
+# Record columns joined onto the IPC link table by ipc_view()
+EXP_COLUMNS = ['Application Number', 'Application Type (ID)', 'Year', 'Arrival_Month', 'Firm']
+
+def data_paths(pattern=DATA_PATTERN):
+    return [p for p in sorted(glob.glob(pattern)) if os.stat(p).st_size > 0]
+
+def empty_dataset():
+    return pd.DataFrame(), {}, pd.DataFrame(), pd.DataFrame()
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# One hash for a set of extracts (a single file keeps its own file hash)
+def sources_hash(paths):
+    hashes = [file_hash(p) for p in paths]
+    if len(hashes) == 1: return hashes[0]
+    return hashlib.blake2b('|'.join(hashes).encode('utf-8'), digest_size=16).hexdigest()
+
+# Records of the extracts in chunks of at most chunk_rows, as text, with each file's
+# Raw/Enriched category row taken off the front. Yields (col_map, records); later files
+# are aligned to the first file's columns.
+def read_chunks(paths, chunk_rows=CHUNK_ROWS):
+    columns = None
+    for path in paths:
+        reader = pd.read_csv(path, header=0, encoding='utf-8', on_bad_lines='skip', dtype=str, chunksize=chunk_rows)
+        col_map = None
+        for chunk in reader:
+            if col_map is None:
+                if chunk.empty: break
+                col_map = {col: str(chunk[col].iloc[0]).strip() for col in chunk.columns}
+                chunk = chunk.iloc[1:]
+                if columns is None: columns = list(chunk.columns)
+            if not chunk.empty: yield col_map, chunk.reindex(columns=columns)
+
+# Per-value date parsing: ISO dates as written, anything else day first. A single
+# to_datetime(dayfirst=True) call infers one format from the first value, so a batch
+# starting with 2022-01-12 read every date as year-day-month and dropped the rest.
+def parse_dates(values):
+    dates = pd.to_datetime(values, errors='coerce', format='ISO8601')
+    rest = dates.isna() & values.notna()
+    if rest.any(): dates[rest] = pd.to_datetime(values[rest], errors='coerce', dayfirst=True, format='mixed')
+    return dates
+
+def preprocess(df_raw):
+    if df_raw.empty: return empty_dataset()
+    category_row = df_raw.iloc[0]
+    col_map = {col: str(category_row[col]).strip() for col in df_raw.columns}
+    df_search, df_analysis, df_exp = preprocess_records(df_raw.iloc[1:])
+    return df_search, col_map, df_analysis, df_exp
+
+# Search/analysis/IPC frames for a block of records whose row ids start at `offset`
+def preprocess_records(records, offset=0):
+    df_search = records.set_axis(pd.RangeIndex(offset, offset + len(records))).fillna("-")
+    category_cols = CATEGORY_COLUMNS + [c for c in df_search.columns if c.startswith('Data of Agent')]
+    for col in category_cols:
+        if col in df_search.columns: df_search[col] = df_search[col].astype('category')
+    df = df_search[ANALYSIS_COLUMNS].copy()
+
+    # --- PARSE DATES (ISO first, then dayfirst=True for safety) ---
+    df['AppDate'] = parse_dates(df_search['Application Date'])
+    df['PriorityDate'] = parse_dates(df_search['Earliest Priority Date'])
+
+    # --- CRITICAL FIX: Only drop rows where AppDate is missing ---
+    # Do NOT drop rows if PriorityDate is missing, to preserve Application Counts
+    df_analysis = df.dropna(subset=['AppDate']).copy()
+    if df_analysis.empty: return df_search, pd.DataFrame(), pd.DataFrame()
+    for col in df_analysis.columns:
+        if isinstance(df_analysis[col].dtype, pd.CategoricalDtype): df_analysis[col] = df_analysis[col].cat.remove_unused_categories()
+
+    # --- ANALYSIS YEAR BASED ON APPLICATION DATE (FILING DATE) ---
+    df_analysis['Year'] = df_analysis['AppDate'].dt.year.astype(int)
+    df_analysis['Month_Name'] = df_analysis['AppDate'].dt.month_name().astype('category')
+    df_analysis['Arrival_Month'] = df_analysis['AppDate'].dt.to_period('M').dt.to_timestamp()
+
+    # Handle Priority Month (allow NaT)
+    df_analysis['Priority_Month'] = df_analysis['PriorityDate'].dt.to_period('M').dt.to_timestamp()
+
+    agent = df_analysis['Data of Agent - Name in English'].astype(str)
+    df_analysis['Firm'] = agent.replace("-", "DIRECT FILING").str.strip().str.upper().astype('category')
+
+    # --- IPC LINK TABLE: one (row_id, ipc code) row per classification, no copy of the record ---
+    ipc_raw = df_search.loc[df_analysis.index, 'Classification'].astype(str).str.split(',').explode()
+    ipc_clean = ipc_raw.str.strip().str.upper()
+    ipc_clean = ipc_clean[~ipc_clean.str.contains("NO CLASSIFICATION|NAN|NONE|-", na=False)]
+    df_exp = pd.DataFrame({
+        'row_id': ipc_clean.index.to_numpy('int32'),
+        'IPC_Clean': ipc_clean.to_numpy(),
+        'IPC_Class3': ipc_clean.str[:3].astype('category').array,
+        'IPC_Section': ipc_clean.str[:1].astype('category').array,
+    })
+    return df_search, df_analysis, df_exp
+
+# Record-level view of the link table for analysis: EXP_COLUMNS of df_analysis joined onto
+# every IPC code whose record is present in df_analysis (pass a filtered frame to filter both)
+def ipc_view(df_analysis, df_exp, columns=EXP_COLUMNS):
+    pos = df_analysis.index.get_indexer(df_exp['row_id'])
+    keep = pos >= 0
+    view = df_analysis[columns].iloc[pos[keep]]
+    links = df_exp[keep]
+    for col in ['IPC_Clean', 'IPC_Class3', 'IPC_Section']:
+        view[col] = links[col].array
+    return view
+
+# Feather needs a default RangeIndex, so the index travels as a column. Categoricals are
+# stored as text (chunks do not share categories) and re-encoded on read.
+def _frame_table(df):
+    categories = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    df = df.reset_index(names='__index__')
+    for col in categories:
+        df[col] = df[col].astype(str)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.replace_schema_metadata({**table.schema.metadata, b'kyrix_categories': json.dumps(categories).encode('utf-8')})
+
+def _write_frame(df, path):
+    feather.write_feather(_frame_table(df), path, compression='uncompressed')
+
+def _read_frame(path):
+    table = feather.read_table(path, memory_map=True)
+    df = table.to_pandas().set_index('__index__').rename_axis(None)
+    for col in json.loads(table.schema.metadata.get(b'kyrix_categories', b'[]')):
+        df[col] = df[col].astype('category')
+    return df
+
+def cache_path(source_hash, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"v{CACHE_VERSION}-{source_hash}")
+
+def read_cache(target):
+    if not os.path.isdir(target): return None
+    try:
+        with open(os.path.join(target, 'col_map.json'), encoding='utf-8') as f:
+            col_map = json.load(f)
+        df_search, df_analysis, df_exp = (_read_frame(os.path.join(target, f"{name}.feather")) for name in FRAMES)
+        return df_search, col_map, df_analysis, df_exp
+    except Exception:
+        return None
+
+# Written to a temp dir and renamed into place so concurrent starts never see a partial cache
+def write_cache(target, dataset):
+    df_search, col_map, df_analysis, df_exp = dataset
+    tmp = f"{target}.tmp-{os.getpid()}"
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        with open(os.path.join(tmp, 'col_map.json'), 'w', encoding='utf-8') as f:
+            json.dump(col_map, f)
+        for name, frame in zip(FRAMES, (df_search, df_analysis, df_exp)):
+            _write_frame(frame, os.path.join(tmp, f"{name}.feather"))
+        os.replace(tmp, target)
+    except OSError:
+        pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+# One chunk's frames and the search index over its rows (runs in pool workers)
+def _preprocess_chunk(records, offset):
+    frames = preprocess_records(records, offset)
+    return frames, InvertedIndex(frames[0])
+
+# Streams preprocessed chunks into a new cache directory: each frame is one Arrow file
+# appended chunk by chunk, renamed into place on close() like write_cache(). Each chunk's
+# index is appended to the running one (InvertedIndex.append) and saved as INDEX_FILE.
+# With an executor (process pool) chunks are preprocessed and tokenized in parallel and
+# written in order.
+class CacheWriter:
+    def __init__(self, target, executor=None):
+        self.target = target
+        self.tmp = f"{target}.tmp-{os.getpid()}"
+        self.executor = executor
+        self.col_map = None
+        self.rows = 0
+        self.index = None
+        self._writers = {}
+        self._pending = deque()
+        os.makedirs(self.tmp, exist_ok=True)
+
+    def add(self, col_map, records):
+        if self.col_map is None: self.col_map = col_map
+        if self.executor is None:
+            self._write(*_preprocess_chunk(records, self.rows))
+        else:
+            self._pending.append(self.executor.submit(_preprocess_chunk, records, self.rows))
+            while len(self._pending) > PENDING_CHUNKS:
+                self._write(*self._pending.popleft().result())
+        self.rows += len(records)
+
+    def _write(self, frames, index):
+        for name, frame in zip(FRAMES, frames):
+            if not frame.empty: self._append(name, frame)
+        self.index = index if self.index is None else self.index.append(index)
+
+    def _append(self, name, frame):
+        table = _frame_table(frame)
+        if name not in self._writers:
+            path = os.path.join(self.tmp, f"{name}.feather")
+            self._writers[name] = (pa.ipc.new_file(path, table.schema), table.schema)
+        writer, schema = self._writers[name]
+        writer.write_table(table.cast(schema))
+
+    # Finish the cache (nothing is written if no records arrived)
+    def close(self):
+        try:
+            while self._pending:
+                self._write(*self._pending.popleft().result())
+            for writer, _ in self._writers.values():
+                writer.close()
+            if not self.rows: return
+            self.index.save(os.path.join(self.tmp, INDEX_FILE))
+            for name in FRAMES:
+                if name not in self._writers: _write_frame(pd.DataFrame(), os.path.join(self.tmp, f"{name}.feather"))
+            with open(os.path.join(self.tmp, 'col_map.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.col_map, f)
+            os.replace(self.tmp, self.target)
+        except OSError:
+            pass
+        finally:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+
+def load_dataset(paths=None, cache_dir=CACHE_DIR):
+    paths = data_paths() if paths is None else paths
+    if not paths: return empty_dataset()
+    try:
+        target = cache_path(sources_hash(paths), cache_dir)
+        cached = read_cache(target)
+        if cached is not None: return cached
+        writer = CacheWriter(target)
+        for col_map, records in read_chunks(paths):
+            writer.add(col_map, records)
+        writer.close()
+        return read_cache(target) or empty_dataset()
+    except Exception:
+        return empty_dataset()
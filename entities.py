@@ -0,0 +1,125 @@
+import os
+import numpy as np
+import pandas as pd
+from similarity import connected_components
+
+# --- KYRIX ENTITY RESOLUTION ---
+# Spelling variants of one agent ("JAH INTELLECTUAL PROPERTY L L C", "Jah Intellectual
+# Property LLC") resolved to one firm. Names are normalized (case, punctuation, legal
+# forms), blocked on their tokens, and only names sharing a block are compared: two
+# organizations (names with a legal form) with a character-trigram Jaccard kernel, anything
+# else (people's names) only by the same words in any order, since near-identical personal
+# names are usually different people. The alias -> entity table is saved with the cached
+# dataset (prep.py builds it ahead of the app); analysis groups on the integer entity ids.
+
+# Record columns resolved, under the name the alias table files them by
+ENTITY_FIELDS = {'Firm': 'Firm'}
+# Legal forms, which mark a name as an organization's
+LEGAL_FORMS = {'CO', 'COMPANY', 'CORP', 'CORPORATION', 'INC', 'INCORPORATED', 'LTD', 'LIMITED',
+               'LLC', 'LLP', 'LC', 'LCC', 'PLC', 'GMBH', 'AG', 'SA', 'SAL', 'SARL', 'SAS', 'SPA', 'BV', 'NV', 'AB', 'KK', 'FZE', 'FZCO', 'FZ'}
+# Legal-form and filler tokens ignored when comparing names
+NAME_STOPWORDS = {'THE', 'AND', 'OF'} | LEGAL_FORMS
+# Trigram Jaccard at which two normalized names are the same entity
+NAME_THRESHOLD = 0.8
+# Blocks larger than this compare each name with its MAX_BLOCK sorted neighbours only
+MAX_BLOCK = 100
+# Names that stand for "no entity" are never merged, nor are lists of several names
+UNRESOLVED_NAMES = {'DIRECT FILING', '-', 'NAN', ''}
+NAME_LIST_RE = r"[,;]"
+
+# Name tokens: upper case, punctuation to spaces (any script), runs of single letters joined
+# (L L C -> LLC, S.A.L -> SAL)
+def _name_tokens(names):
+    keys = pd.Series(names, dtype=object).astype(str).str.upper().str.replace('&', ' AND ', regex=False)
+    keys = keys.str.replace(r"[\W_]+", ' ', regex=True).str.strip()
+    keys = keys.str.replace(r"\b(?:[A-Z0-9] )+[A-Z0-9]\b", lambda m: m.group(0).replace(' ', ''), regex=True)
+    return keys.str.split()
+
+# Comparison keys: name tokens with legal forms and fillers dropped
+def _normalize_tokens(tokens):
+    return tokens.map(lambda t: ' '.join(w for w in t if w not in NAME_STOPWORDS) or ' '.join(t)).to_numpy(dtype=object)
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Candidate pairs: names sharing their first or their longest token
+def _blocked_pairs(keys):
+    tokens = [k.split() for k in keys]
+    blocks = {}
+    for i, t in enumerate(tokens):
+        if not t: continue
+        for block in {t[0], max(t, key=len)}:
+            blocks.setdefault(block, []).append(i)
+    pairs = set()
+    for members in blocks.values():
+        if len(members) < 2: continue
+        members = sorted(members, key=keys.__getitem__)
+        reach = len(members) if len(members) <= MAX_BLOCK else MAX_BLOCK + 1
+        for a in range(len(members)):
+            for b in range(a + 1, min(a + reach, len(members))):
+                pairs.add((min(members[a], members[b]), max(members[a], members[b])))
+    return pairs
+
+# Alias table for one column's names: every distinct name with its entity id, the entity's
+# display name (its most frequent spelling) and the name's record count
+def resolve_names(names):
+    counts = pd.Series(names, dtype=object).value_counts(dropna=True)
+    aliases = counts.index.to_numpy(dtype=object)
+    tokens = _name_tokens(aliases)
+    keys = _normalize_tokens(tokens)
+    # Identical keys always merge. Distinct keys of two organizations merge when their trigram
+    # Jaccard is high enough, any other two only when they hold the same words
+    key_codes, distinct = pd.factorize(keys)
+    org = np.zeros(len(distinct), dtype=bool)
+    np.logical_or.at(org, key_codes, tokens.map(lambda t: any(w in LEGAL_FORMS for w in t)).to_numpy(dtype=bool))
+    words = [sorted(k.split()) for k in distinct]
+    grams = [_trigrams(k) for k in distinct]
+    edges = [(a, b) for a, b in _blocked_pairs(list(distinct))
+             if (len(grams[a] & grams[b]) >= NAME_THRESHOLD * len(grams[a] | grams[b]) if org[a] and org[b] else words[a] == words[b])]
+    labels = connected_components(len(distinct), np.array(edges, dtype=np.int64).reshape(-1, 2))[key_codes]
+    names = pd.Series(aliases, dtype=object).astype(str)
+    unresolved = (names.str.upper().isin(UNRESOLVED_NAMES) | names.str.contains(NAME_LIST_RE, regex=True) | (keys == '')).to_numpy()
+    labels[unresolved] = len(distinct) + np.flatnonzero(unresolved)
+    # Entities numbered by size; each is named after its most frequent alias
+    table = pd.DataFrame({'Alias': aliases, 'Records': counts.to_numpy(), 'Group': labels})
+    totals = table.groupby('Group')['Records'].transform('sum')
+    table = table.assign(Total=totals).sort_values(['Total', 'Group', 'Records', 'Alias'], ascending=[False, True, False, True], kind='stable')
+    table['Entity_ID'] = pd.factorize(table['Group'])[0].astype(np.int32)
+    table['Entity'] = table.groupby('Entity_ID')['Alias'].transform('first')
+    return table[['Alias', 'Entity_ID', 'Entity', 'Records']].reset_index(drop=True)
+
+# Alias tables for every ENTITY_FIELDS column of df_analysis, stacked with a Field column
+def build_aliases(df_analysis):
+    tables = [resolve_names(df_analysis[col]).assign(Field=field) for field, col in ENTITY_FIELDS.items() if col in df_analysis]
+    if not tables: return pd.DataFrame(columns=['Field', 'Alias', 'Entity_ID', 'Entity', 'Records'])
+    return pd.concat(tables, ignore_index=True)[['Field', 'Alias', 'Entity_ID', 'Entity', 'Records']]
+
+def save_aliases(aliases, path):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    aliases.to_feather(tmp)
+    os.replace(tmp, path)
+
+def load_aliases(path):
+    return pd.read_feather(path)
+
+# Categorical column of aliases -> categorical of entity names, one category per entity
+# (sorted like the raw names were); names missing from the table keep their own spelling
+def resolve_column(values, aliases, field):
+    table = aliases[aliases['Field'] == field]
+    values = values.astype('category')
+    names = table.drop_duplicates('Entity_ID').sort_values('Entity_ID')['Entity'].to_numpy(dtype=object)
+    ids = table['Entity_ID'].to_numpy()[pd.Index(table['Alias']).get_indexer(values.cat.categories)]
+    missing = ids < 0
+    ids[missing] = len(names) + np.arange(int(missing.sum()))
+    names = np.concatenate([names, values.cat.categories.to_numpy(dtype=object)[missing]])
+    codes = values.cat.codes.to_numpy()
+    entity_codes = np.where(codes >= 0, ids[codes], -1)
+    resolved = pd.Categorical.from_codes(entity_codes, categories=pd.Index(names, dtype=str))
+    return resolved.reorder_categories(resolved.categories.sort_values())
+
+# Cube with its Firm dimension resolved to entities and rows of merged variants summed
+def resolve_cube(cube, aliases, dims):
+    if cube.empty or 'Firm' not in cube: return cube
+    cube = cube.assign(Firm=resolve_column(cube['Firm'], aliases, 'Firm'))
+    return cube.groupby(dims, observed=True)['N'].sum().reset_index()
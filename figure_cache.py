@@ -0,0 +1,93 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+# --- KYRIX FIGURE CACHE ---
+# Process-wide LRU of finished Plotly figures, keyed by a canonical hash of the
+# inputs that produced them and bounded by entry count and estimated size. The size
+# comes from the data points across fig.data, counted once at insert time
+# (serializing every figure a second time would cost as much as the render).
+
+# Rough in-memory cost of one data value, and of a trace's own attributes
+BYTES_PER_POINT = 16
+BYTES_PER_TRACE = 1024
+
+# Tuples keep their order; lists/sets/arrays are filter selections and compare as sets.
+# Pass a selection as a tuple when its order shows in the chart (trace order).
+def _canonical(value):
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (list, set, frozenset, np.ndarray, pd.Index, pd.Series)):
+        return sorted((_canonical(v) for v in value), key=repr)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def figure_key(*parts):
+    payload = json.dumps(_canonical(parts), sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+# Data values in a trace's set attributes (arrays, lists, nested marker/line settings)
+def _points(value):
+    if isinstance(value, np.ndarray): return value.size
+    if isinstance(value, (list, tuple)): return len(value)
+    if isinstance(value, dict): return sum(_points(v) for v in value.values())
+    return 0
+
+# Estimated bytes held by a figure's traces
+def figure_size(fig):
+    return sum(BYTES_PER_TRACE + BYTES_PER_POINT * _points(trace.to_plotly_json()) for trace in fig.data)
+
+class FigureCache:
+    def __init__(self, max_bytes=64 << 20, max_entries=128):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    # Cached figure for these inputs, or build() it (outside the lock) and remember it.
+    # Figures are shared between sessions, so build() must return a finished figure.
+    def get(self, parts, build):
+        key = figure_key(*parts)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        fig = build()
+        size = figure_size(fig)
+        with self._lock:
+            self.misses += 1
+            if size > self.max_bytes: return fig
+            old = self._entries.pop(key, None)
+            if old is not None: self._bytes -= old[1]
+            self._entries[key] = (fig, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
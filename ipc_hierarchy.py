@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+# --- KYRIX IPC HIERARCHY ---
+# Every IPC code of the link table parsed once into section > class > subclass > main
+# group > subgroup. Distinct codes are kept in canonical form ("B63B 22/04") in one sorted
+# array, so everything under a node is a contiguous range found by binary search (a
+# flattened trie), and each level is an integer code per distinct code.
+
+IPC_LEVELS = ['IPC_Section', 'IPC_Class3', 'IPC_Subclass', 'IPC_Group', 'IPC_Subgroup']
+LEVEL_NAMES = {'IPC_Section': 'Section', 'IPC_Class3': 'Class', 'IPC_Subclass': 'Subclass', 'IPC_Group': 'Main Group', 'IPC_Subgroup': 'Subgroup'}
+IPC_RE = r'^([A-H])(?:(\d{2})(?:([A-Z])(?:\s*(\d{1,4})(?:\s*/\s*(\d{1,6}))?)?)?)?$'
+# Sorts after any code character: prefix p spans [p, p + MAX_CHAR)
+MAX_CHAR = chr(0x10FFFF)
+
+# Canonical code and its label at every level (NaN below the depth the code reaches);
+# codes that do not parse (including partial ones like "B6") keep their text and have no levels
+def parse_ipc(codes):
+    codes = pd.Series(codes, dtype=object).astype(str).str.strip().str.upper()
+    parts = codes.str.extract(IPC_RE)
+    section = parts[0]
+    cls = (section + parts[1]).where(parts[1].notna())
+    subclass = (cls + parts[2]).where(parts[2].notna())
+    group = (subclass + ' ' + parts[3]).where(parts[3].notna())
+    subgroup = (group + '/' + parts[4]).where(parts[4].notna())
+    levels = pd.DataFrame(dict(zip(IPC_LEVELS, [section, cls, subclass, group, subgroup])), index=codes.index)
+    canonical = levels.ffill(axis=1).iloc[:, -1].fillna(codes)
+    return canonical.rename('IPC_Code'), levels
+
+class IpcHierarchy:
+    # codes: IPC code per link (df_exp['IPC_Clean']), row_ids: the link's record
+    def __init__(self, codes, row_ids):
+        link_codes, distinct = pd.factorize(pd.Series(codes, dtype=object))
+        canonical, levels = parse_ipc(distinct)
+        vocab, vocab_of_distinct = np.unique(canonical.to_numpy(dtype=str), return_inverse=True)
+        self.vocab = vocab
+        # Level code of every vocab entry (-1: code does not reach that level)
+        levels = levels.groupby(vocab_of_distinct).first()
+        self.labels, self.level_codes = {}, {}
+        for level in IPC_LEVELS:
+            codes_, labels = pd.factorize(levels[level], sort=True)
+            self.labels[level], self.level_codes[level] = labels, codes_.astype(np.int32)
+        # Links ordered by vocab entry; bounds[v]:bounds[v + 1] are the links of entry v
+        link_vocab = vocab_of_distinct[link_codes] if len(link_codes) else np.empty(0, dtype=np.int64)
+        order = np.argsort(link_vocab, kind='stable')
+        self.link_vocab = link_vocab[order]
+        self.link_rows = np.asarray(row_ids)[order]
+        self.bounds = np.searchsorted(self.link_vocab, np.arange(len(vocab) + 1))
+
+    # Vocab range [lo, hi) of a query: "B63B*" is a text prefix, "B63B 22" the node and its
+    # descendants (not B63B 220), "B63B 22/04" one subgroup; None or "" is everything
+    def range(self, pattern=None):
+        pattern = (pattern or '').strip().upper()
+        if not pattern: return 0, len(self.vocab)
+        if pattern.endswith('*'):
+            prefix = pattern.rstrip('*').strip()
+            if not prefix: return 0, len(self.vocab)
+            return self._span(prefix, prefix + MAX_CHAR)
+        canonical, levels = parse_ipc([pattern])
+        node = canonical.iloc[0]
+        if pd.notna(levels['IPC_Subgroup'].iloc[0]):
+            return int(np.searchsorted(self.vocab, node)), int(np.searchsorted(self.vocab, node, side='right'))
+        # A main group's subgroups follow "/" which sorts before every digit
+        if pd.notna(levels['IPC_Group'].iloc[0]): return self._span(node, node + '0')
+        return self._span(node, node + MAX_CHAR)
+
+    def _span(self, lo, hi):
+        return tuple(int(i) for i in np.searchsorted(self.vocab, [lo, hi]))
+
+    # Links under the pattern with their label at `level` (links not reaching it are left out)
+    def links(self, pattern=None, level='IPC_Subgroup'):
+        lo, hi = self.range(pattern)
+        sel = slice(self.bounds[lo], self.bounds[hi])
+        codes = self.level_codes[level][self.link_vocab[sel]]
+        keep = codes >= 0
+        return pd.DataFrame({
+            'row_id': self.link_rows[sel][keep],
+            level: pd.Categorical.from_codes(codes[keep], categories=self.labels[level]),
+        })
+
+    # Labels at `level` under the pattern, for pickers
+    def nodes(self, level, pattern=None):
+        lo, hi = self.range(pattern)
+        codes = np.unique(self.level_codes[level][lo:hi])
+        return self.labels[level][codes[codes >= 0]]
@@ -0,0 +1,82 @@
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- KYRIX PROFILER ---
+# Lightweight per-rerun instrumentation: every named stage of a script run records its
+# wall time, a row count and the change in process RSS. The finished rerun is one record,
+# logged as a JSON line on the 'kyrix.profile' logger (to a file with KYRIX_PROFILE_LOG)
+# and kept in the session for the admin panel.
+
+PROFILE_LOGGER = 'kyrix.profile'
+# Reruns kept per session for the admin panel and its export
+PROFILE_HISTORY = 50
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Resident set size in bytes (None where /proc is unavailable)
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _mb(n):
+    return None if n is None else round(n / 2 ** 20, 2)
+
+class RerunProfile:
+    def __init__(self, **context):
+        self.context = context
+        self.stages = []
+        self.created = datetime.now().isoformat(timespec='milliseconds')
+        self._depth = 0
+        self._started = time.perf_counter()
+        self._rss = rss_bytes()
+
+    # Times the block; the yielded dict takes extra fields (rows=..., cache=...)
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = {'stage': name, 'depth': self._depth, 'rows': rows}
+        self.stages.append(record)
+        self._depth += 1
+        rss, started = rss_bytes(), time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['ms'] = round((time.perf_counter() - started) * 1000, 2)
+            after = rss_bytes()
+            record['rss_delta_mb'] = None if rss is None or after is None else _mb(after - rss)
+            self._depth -= 1
+
+    def finish(self, **context):
+        self.context.update(context)
+        rss = rss_bytes()
+        return {
+            'time': self.created,
+            **self.context,
+            'total_ms': round((time.perf_counter() - self._started) * 1000, 2),
+            'rss_mb': _mb(rss),
+            'rss_delta_mb': None if rss is None or self._rss is None else _mb(rss - self._rss),
+            'stages': self.stages,
+        }
+
+# The profile logger, with a JSON-lines file handler when KYRIX_PROFILE_LOG names a file
+def profile_logger():
+    logger = logging.getLogger(PROFILE_LOGGER)
+    path = os.environ.get('KYRIX_PROFILE_LOG')
+    if path and not any(getattr(h, 'baseFilename', None) == os.path.abspath(path) for h in logger.handlers):
+        handler = logging.FileHandler(path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+def log_profile(record, logger=None):
+    (logger or profile_logger()).info(json.dumps(record, default=str))
+
+# Records as JSON lines, for export
+def profile_jsonl(records):
+    return ''.join(json.dumps(r, default=str) + '\n' for r in records)
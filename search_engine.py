@@ -0,0 +1,672 @@
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# --- KYRIX SEARCH ENGINE ---
+# Tokenized inverted index over the search frame. Built once per dataset and
+# shared across reruns; queries compile to a plan evaluated as set operations
+# over sorted posting arrays.
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Its complement: the index splits lower-cased cells on it in Arrow, with no string per token
+TOKEN_SEPARATOR = r"[^a-z0-9]+"
+EMPTY_IDS = np.empty(0, dtype=np.int64)
+
+# Field prefixes accepted in queries (title:hydrogen) -> search frame column
+FIELD_ALIASES = {
+    'title': 'Title in English',
+    'abstract': 'Abstract in English',
+    'ipc': 'Classification',
+    'applicant': 'Data of Applicant - Legal Name in English',
+    'agent': 'Data of Agent - Name in English',
+    'appno': 'Application Number',
+}
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+# Occurrence keys pack (row, position) into one sortable int64: row << 32 | position.
+# Token offsets past MAX_POSITION in one cell share the last position.
+POS_BITS = 32
+MAX_POSITION = (1 << 20) - 1
+# Rows tokenized at a time; only one block's token strings are alive at once
+TOKEN_BLOCK = 20_000
+
+# BM25 relevance: standard k1/b, scored on titles and abstracts with title hits boosted
+BM25_K1 = 1.2
+BM25_B = 0.75
+RANK_FIELDS = {'Title in English': 2.0, 'Abstract in English': 1.0}
+# Only the ranked text columns keep token positions. Other columns index distinct
+# (term, row) pairs; a phrase or NEAR there matches rows holding all its words.
+POSITIONAL_FIELDS = tuple(RANK_FIELDS)
+
+# Sorted vocabulary + contiguous arrays grouped by term: occurrence keys for
+# phrase/NEAR merging, distinct row ids for boolean operators and their term
+# frequencies for ranking.
+# Terms sharing a prefix are adjacent, so wildcard lookups are a single slice.
+# Built from (row, term code, position) triples; codes index the sorted vocab.
+# With positions=None the table is row-level: no occurrence keys or frequencies.
+class PostingTable:
+    def __init__(self, rows, codes, positions, vocab):
+        if positions is None:
+            order = np.lexsort((rows, codes))
+            self._index(None, codes[order], vocab, rows[order])
+            return
+        keys = (rows << POS_BITS) | positions
+        order = np.lexsort((keys, codes))
+        self._index(keys[order], codes[order], vocab)
+
+    # From saved arrays: keys already grouped by term, key_bounds marking each term's slice
+    @classmethod
+    def from_sorted(cls, keys, key_bounds, vocab):
+        table = cls.__new__(cls)
+        table._index(keys, np.repeat(np.arange(len(vocab)), np.diff(key_bounds)), vocab)
+        return table
+
+    # Row-level table from saved arrays: distinct rows grouped by term, bounds per term
+    @classmethod
+    def from_rows(cls, rows, bounds, vocab):
+        table = cls.__new__(cls)
+        table.keys = table.key_bounds = table.tf = None
+        table.rows, table.bounds, table.vocab = rows, bounds, vocab
+        table._term_ids = None
+        return table
+
+    @property
+    def positional(self):
+        return self.keys is not None
+
+    # Term -> code, built on first lookup (tables folded block by block never need the
+    # intermediate ones)
+    @property
+    def term_ids(self):
+        if self._term_ids is None: self._term_ids = {t: k for k, t in enumerate(self.vocab.tolist())}
+        return self._term_ids
+
+    def _index(self, keys, codes, vocab, key_rows=None):
+        self.keys = keys
+        self.vocab = vocab
+        self.key_bounds = None if keys is None else np.searchsorted(codes, np.arange(len(self.vocab) + 1))
+        if keys is not None: key_rows = self.keys >> POS_BITS
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (key_rows[1:] != key_rows[:-1])
+        self.rows = key_rows[first]
+        self.tf = None if keys is None else np.diff(np.append(np.flatnonzero(first), len(codes))).astype(np.int32)
+        self.bounds = np.searchsorted(codes[first], np.arange(len(self.vocab) + 1))
+        self._term_ids = None
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def get(self, term):
+        k = self.term_ids.get(term)
+        if k is None: return EMPTY_IDS
+        return self.rows[self.bounds[k]:self.bounds[k + 1]]
+
+    def count(self, term):
+        k = self.term_ids.get(term)
+        return 0 if k is None else int(self.bounds[k + 1] - self.bounds[k])
+
+    def occurrences(self, term):
+        k = self.term_ids.get(term)
+        if k is None: return EMPTY_IDS
+        return self.keys[self.key_bounds[k]:self.key_bounds[k + 1]]
+
+    def prefix_range(self, prefix):
+        lo = np.searchsorted(self.vocab, prefix, side='left')
+        hi = np.searchsorted(self.vocab, prefix + '\uffff', side='left')
+        return lo, hi
+
+    def get_prefix(self, prefix):
+        lo, hi = self.prefix_range(prefix)
+        return np.unique(self.rows[self.bounds[lo]:self.bounds[hi]])
+
+    def term_range(self, term):
+        k = self.term_ids.get(term)
+        return (0, 0) if k is None else (k, k + 1)
+
+    def count_prefix(self, prefix):
+        lo, hi = self.prefix_range(prefix)
+        return int(self.bounds[hi] - self.bounds[lo])
+
+    def prefix_occurrences(self, prefix):
+        lo, hi = self.prefix_range(prefix)
+        return np.sort(self.keys[self.key_bounds[lo]:self.key_bounds[hi]])
+
+    # This table with rows renumbered by row_map (-1: removed) and the postings of added
+    # rows (already numbered) merged in. Surviving rows must keep their relative order: the
+    # old postings then stay sorted, and only the added ones are placed, by binary search.
+    def merge(self, row_map, rows, codes, positions, vocab):
+        old_rows, old_codes, old_positions = self.triples()
+        new_rows = row_map[old_rows]
+        keep = new_rows >= 0
+        n_old = int(keep.sum())
+        codes, vocab = _merge_codes([(old_codes[keep], self.vocab), (codes, vocab)])
+        old_codes, add_codes = codes[:n_old], codes[n_old:]
+        if self.positional:
+            old_keys, add_keys = (new_rows[keep] << POS_BITS) | old_positions[keep], (rows << POS_BITS) | positions
+        else:
+            old_keys, add_keys = new_rows[keep], rows
+        order = np.lexsort((add_keys, add_codes))
+        add_keys, add_codes = add_keys[order], add_codes[order]
+        at = _insert_positions(old_keys, np.searchsorted(old_codes, np.arange(len(vocab) + 1)), add_codes, add_keys)
+        keys, codes = np.insert(old_keys, at, add_keys), np.insert(old_codes, at, add_codes)
+        table = PostingTable.__new__(PostingTable)
+        if self.positional: table._index(keys, codes, vocab)
+        else: table._index(None, codes, vocab, keys)
+        return table
+
+    # This table followed by `other`, a table over later rows numbered from `offset`: every
+    # term keeps its own postings ahead of other's, so the blocks are interleaved, not re-sorted
+    def append(self, other, offset=0):
+        vocab = np.union1d(self.vocab, other.vocab)
+        codes = (np.searchsorted(vocab, self.vocab), np.searchsorted(vocab, other.vocab))
+        table = PostingTable.__new__(PostingTable)
+        table.vocab, table._term_ids = vocab, None
+        table.keys = table.key_bounds = table.tf = None
+        if self.positional:
+            table.key_bounds, (table.keys,) = _append_blocks(codes, (self.key_bounds, other.key_bounds), [(self.keys, other.keys + (offset << POS_BITS))], len(vocab))
+            table.bounds, (table.rows, table.tf) = _append_blocks(codes, (self.bounds, other.bounds), [(self.rows, other.rows + offset), (self.tf, other.tf)], len(vocab))
+        else:
+            table.bounds, (table.rows,) = _append_blocks(codes, (self.bounds, other.bounds), [(self.rows, other.rows + offset)], len(vocab))
+        return table
+
+    # The (row, term code, position) triples the table was built from (positions None if row-level)
+    def triples(self):
+        if not self.positional:
+            return self.rows, np.repeat(np.arange(len(self.vocab)), np.diff(self.bounds)), None
+        codes = np.repeat(np.arange(len(self.vocab)), np.diff(self.key_bounds))
+        return self.keys >> POS_BITS, codes, self.keys & ((1 << POS_BITS) - 1)
+
+# Term codes against several vocabularies -> codes against one sorted vocabulary
+# holding just the terms that occur. parts: [(codes, vocab), ...]
+def _merge_codes(parts):
+    vocabs = [np.asarray(v, dtype=str) for _, v in parts]
+    vocab = np.unique(np.concatenate(vocabs)) if vocabs else np.empty(0, dtype=str)
+    codes = [np.searchsorted(vocab, v)[c] for (c, _), v in zip(parts, vocabs)]
+    codes = np.concatenate(codes) if codes else EMPTY_IDS
+    used = np.bincount(codes, minlength=len(vocab)) > 0
+    return (np.cumsum(used) - 1)[codes], vocab[used]
+
+# Tokens of one block of a column whose first row is `start`: rows, positions, token counts
+# per row and term codes against the block's own vocabulary (runs in pool workers).
+# Without positional, repeated (row, term) pairs are dropped and positions is None.
+def _tokenize_block(texts, start, positional=True):
+    lower = pa.array(texts.astype(str).str.lower().to_numpy(object), type=pa.large_string(), from_pandas=True)
+    parts = pc.split_pattern_regex(lower, pattern=TOKEN_SEPARATOR)
+    flat = pc.list_flatten(parts)
+    words = pc.not_equal(flat, "")
+    rows = pc.list_parent_indices(parts).filter(words).to_numpy().astype(np.int64)
+    encoded = pc.dictionary_encode(flat.filter(words))
+    codes, vocab = encoded.indices.to_numpy().astype(np.int64), encoded.dictionary.to_numpy(zero_copy_only=False)
+    lens = np.bincount(rows, minlength=len(texts)).astype(np.int64)
+    if not positional:
+        pairs = np.unique(rows * max(len(vocab), 1) + codes)
+        return pairs // max(len(vocab), 1) + start, None, lens, pairs % max(len(vocab), 1), vocab
+    positions = np.arange(len(rows), dtype=np.int64) - np.repeat(np.cumsum(lens) - lens, lens)
+    return rows + start, np.minimum(positions, MAX_POSITION), lens, codes, vocab
+
+# Two blocks of term-grouped arrays laid out as one: codes map each block's terms into the
+# merged vocabulary and bounds mark each block's per-term slices; within a term the first
+# block's entries come first. arrays: (first, second) pairs sharing those bounds.
+def _append_blocks(codes, bounds, arrays, n_terms):
+    counts = [np.diff(b) for b in bounds]
+    sizes = np.zeros(n_terms, dtype=np.int64)
+    for c, n in zip(codes, counts):
+        sizes[c] += n
+    merged = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(sizes, out=merged[1:])
+    starts = merged[:-1].copy()
+    slots = []
+    for c, b, n in zip(codes, bounds, counts):
+        slots.append(np.repeat(starts[c] - b[:-1], n) + np.arange(b[-1]))
+        starts[c] += n
+    out = []
+    for first, second in arrays:
+        both = np.empty(len(first) + len(second), dtype=first.dtype)
+        both[slots[0]], both[slots[1]] = first, second
+        out.append(both)
+    return merged, out
+
+# Where (code, key) pairs go among keys grouped by term (bounds: each code's slice) so every
+# term's keys stay sorted: one binary search per pair, all pairs stepping together
+def _insert_positions(keys, bounds, codes, values):
+    lo, hi = bounds[codes], bounds[codes + 1]
+    while True:
+        active = lo < hi
+        if not active.any(): return lo
+        mid = (lo + hi) // 2
+        less = np.zeros(len(lo), dtype=bool)
+        less[active] = keys[mid[active]] < values[active]
+        lo = np.where(less, mid + 1, lo)
+        hi = np.where(active & ~less, mid, hi)
+
+# Sorted distinct rows of several sorted row arrays
+def _union(parts):
+    parts = [p for p in parts if p.size]
+    if not parts: return EMPTY_IDS
+    return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+# Mask of values present in a sorted array (merge via binary search)
+def _member(sorted_arr, values):
+    idx = np.searchsorted(sorted_arr, values)
+    hit = idx < sorted_arr.size
+    hit[hit] = sorted_arr[idx[hit]] == values[hit]
+    return hit
+
+# --- QUERY COMPILER ---
+# Grammar (operators are upper case, juxtaposition means AND):
+#   or_expr   := and_expr ('OR' and_expr)*
+#   and_expr  := near_expr (['AND'] near_expr)*
+#   near_expr := not_expr ('NEAR/n' not_expr)*
+#   not_expr  := 'NOT' not_expr | atom
+#   atom     := '(' or_expr ')' | field ':' atom | "quoted phrase" | term | prefix*
+# Plan nodes are tuples: ('term', field, tok), ('prefix', field, tok),
+# ('phrase', field, toks), ('near', n, (left, right)), ('and', children),
+# ('or', children), ('not', child). A field of None means "any column".
+# NEAR only applies between terms, prefixes and phrases; other operands
+# (e.g. a parenthesized OR) fall back to AND.
+# Sidebar field filters parse with prefix=True: a bare word matches the words it
+# starts (H04 -> H04N, smith -> SmithKline), as the old substring filters did;
+# a quoted word or phrase still matches exactly.
+QUERY_TOKEN_RE = re.compile(r'\(|\)|"[^"]*"?|[A-Za-z]+:(?=[^\s)])|[^\s()"]+')
+NEAR_RE = re.compile(r'NEAR(?:/(\d+))?$')
+DEFAULT_NEAR = 10
+POSITIONAL = ('term', 'prefix', 'phrase')
+
+# Distances past MAX_POSITION are clamped, so a window never reaches into another row's keys
+def _near_distance(tok):
+    match = NEAR_RE.match(tok) if tok else None
+    if match is None: return None
+    return min(int(match.group(1)), MAX_POSITION) if match.group(1) else DEFAULT_NEAR
+
+def _text_node(field, tokens):
+    if not tokens: return None
+    if len(tokens) == 1: return ('term', field, tokens[0])
+    return ('phrase', field, tuple(tokens))
+
+class _QueryParser:
+    def __init__(self, tokens, prefix=False):
+        self.tokens = tokens
+        self.prefix = prefix
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def parse_or(self, field):
+        nodes = [self.parse_and(field)]
+        while self.peek() == 'OR':
+            self.pos += 1
+            nodes.append(self.parse_and(field))
+        nodes = [n for n in nodes if n is not None]
+        if not nodes: return None
+        return nodes[0] if len(nodes) == 1 else ('or', tuple(nodes))
+
+    def parse_and(self, field):
+        nodes = []
+        while self.peek() not in (None, 'OR', ')'):
+            if self.peek() == 'AND' or _near_distance(self.peek()) is not None:
+                self.pos += 1
+                continue
+            node = self.parse_near(field)
+            if node is not None: nodes.append(node)
+        if not nodes: return None
+        return nodes[0] if len(nodes) == 1 else ('and', tuple(nodes))
+
+    def parse_near(self, field):
+        node = last = self.parse_not(field)
+        clauses = []
+        while _near_distance(self.peek()) is not None:
+            distance = _near_distance(self.take())
+            right = self.parse_not(field)
+            if right is None: continue
+            if last is None:
+                node = last = right
+                continue
+            if last[0] in POSITIONAL and right[0] in POSITIONAL:
+                clauses.append(('near', distance, (last, right)))
+            else:
+                clauses.extend([last, right])
+            last = right
+        if not clauses: return node
+        return clauses[0] if len(clauses) == 1 else ('and', tuple(clauses))
+
+    def parse_not(self, field):
+        if self.peek() == 'NOT':
+            self.pos += 1
+            child = self.parse_not(field)
+            return ('not', child) if child is not None else None
+        return self.parse_atom(field)
+
+    def parse_atom(self, field):
+        tok = self.take()
+        if tok is None: return None
+        if tok == '(':
+            node = self.parse_or(field)
+            if self.peek() == ')': self.pos += 1
+            return node
+        if tok.endswith(':') and tok[:-1].lower() in FIELD_ALIASES:
+            if self.peek() in (None, 'OR', 'AND', ')'): return None
+            return self.parse_atom(FIELD_ALIASES[tok[:-1].lower()])
+        if tok.startswith('"'):
+            return _text_node(field, tokenize(tok.strip('"')))
+        if tok.endswith('*') or self.prefix:
+            tokens = tokenize(tok.rstrip('*'))
+            if not tokens: return None
+            prefix = ('prefix', field, tokens[-1])
+            head = _text_node(field, tokens[:-1])
+            return prefix if head is None else ('and', (head, prefix))
+        return _text_node(field, tokenize(tok))
+
+@lru_cache(maxsize=512)
+def parse_query(query, field=None, prefix=False):
+    parser = _QueryParser(QUERY_TOKEN_RE.findall(query), prefix)
+    nodes = []
+    # Stray closing parentheses are skipped rather than rejected
+    while parser.peek() is not None:
+        if parser.peek() == ')':
+            parser.pos += 1
+            continue
+        node = parser.parse_or(field)
+        if node is not None: nodes.append(node)
+    if not nodes: return None
+    return nodes[0] if len(nodes) == 1 else ('and', tuple(nodes))
+
+class InvertedIndex:
+    # executor: optional concurrent.futures pool the column blocks are tokenized on.
+    # Each block of TOKEN_BLOCK rows is sorted on its own and appended to its column's table,
+    # so peak memory is the finished tables plus one block, not every column's triples.
+    def __init__(self, df, columns=None, executor=None):
+        self.columns = list(columns) if columns is not None else list(df.columns)
+        tables, lens = {}, {col: [] for col in self.columns if col in RANK_FIELDS}
+        for col, (rows, positions, block_lens, codes, vocab) in self._blocks(df, executor):
+            codes, vocab = _merge_codes([(codes, vocab)])
+            block = PostingTable(rows, codes, positions, vocab)
+            tables[col] = tables[col].append(block) if col in tables else block
+            if col in lens: lens[col].append(block_lens)
+        for col in self.columns:
+            if col not in tables: tables[col] = PostingTable(EMPTY_IDS, EMPTY_IDS, EMPTY_IDS if col in POSITIONAL_FIELDS else None, np.empty(0, dtype=str))
+        self._build(len(df), tables, {col: np.concatenate(n) if n else EMPTY_IDS for col, n in lens.items()})
+
+    # (column, tokenized block) pairs, column by column in row order (see _tokenize_block)
+    def _blocks(self, df, executor=None):
+        tasks = [(col, start) for col in self.columns for start in range(0, len(df), TOKEN_BLOCK)]
+        texts = (df[col].iloc[start:start + TOKEN_BLOCK] for col, start in tasks)
+        mapper = map if executor is None else executor.map
+        results = mapper(_tokenize_block, texts, [start for _, start in tasks], [col in POSITIONAL_FIELDS for col, _ in tasks])
+        return zip((col for col, _ in tasks), results)
+
+    # Per column: one (row, term code, position) triple per token occurrence, the vocabulary
+    # and token counts per row
+    def _tokenize(self, df, executor=None):
+        blocks = {col: [] for col in self.columns}
+        for col, block in self._blocks(df, executor):
+            blocks[col].append(block)
+        postings = {}
+        for col, parts in blocks.items():
+            rows, positions, lens, codes, vocabs = zip(*parts) if parts else ([EMPTY_IDS],) * 3 + ((), ())
+            codes, vocab = _merge_codes(list(zip(codes, vocabs)))
+            positions = np.concatenate(positions) if col in POSITIONAL_FIELDS else None
+            lens = np.concatenate(lens) if col in RANK_FIELDS else None
+            postings[col] = (np.concatenate(rows), codes, positions, vocab, lens)
+        return postings
+
+    # One posting table per column (queries without a field take the union over them) and
+    # token counts per row of the ranked columns
+    def _build(self, n_rows, tables, lens):
+        self.n_rows = n_rows
+        self.all_ids = np.arange(n_rows, dtype=np.int64)
+        self.fields = tables
+        self.doc_lens = {col: lens[col] for col in self.columns if col in RANK_FIELDS}
+        self.avg_lens = {col: max(float(n.mean()) if n.size else 0.0, 1.0) for col, n in self.doc_lens.items()}
+
+    # Posting arrays as one uncompressed .npz, written to a temp file and renamed into place.
+    # Terms are [a-z0-9]+, so each vocabulary is stored as newline-joined bytes.
+    # Positional tables store occurrence keys, row-level tables their distinct rows.
+    def save(self, path):
+        arrays = {'n_rows': np.array(self.n_rows), 'columns': np.array(self.columns, dtype=str)}
+        for name, table in ((str(i), self.fields[col]) for i, col in enumerate(self.columns)):
+            if table.positional:
+                arrays[f'{name}_keys'] = table.keys
+                arrays[f'{name}_key_bounds'] = table.key_bounds
+            else:
+                arrays[f'{name}_rows'] = table.rows
+                arrays[f'{name}_bounds'] = table.bounds
+            arrays[f'{name}_vocab'] = np.frombuffer('\n'.join(table.vocab.tolist()).encode('ascii'), dtype=np.uint8)
+        for i, col in enumerate(self.columns):
+            if col in self.doc_lens: arrays[f'{i}_lens'] = self.doc_lens[col]
+        tmp = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        def vocab(name):
+            text = data[f'{name}_vocab'].tobytes().decode('ascii')
+            return np.array(text.split('\n') if text else [], dtype=str)
+        index = cls.__new__(cls)
+        with np.load(path) as data:
+            index.columns = data['columns'].tolist()
+            index.n_rows = int(data['n_rows'])
+            index.all_ids = np.arange(index.n_rows, dtype=np.int64)
+            index.fields, index.doc_lens, index.avg_lens = {}, {}, {}
+            for i, col in enumerate(index.columns):
+                if f'{i}_keys' in data: index.fields[col] = PostingTable.from_sorted(data[f'{i}_keys'], data[f'{i}_key_bounds'], vocab(i))
+                else: index.fields[col] = PostingTable.from_rows(data[f'{i}_rows'], data[f'{i}_bounds'], vocab(i))
+                if f'{i}_lens' in data:
+                    index.doc_lens[col] = data[f'{i}_lens']
+                    index.avg_lens[col] = max(float(index.doc_lens[col].mean()) if index.doc_lens[col].size else 0.0, 1.0)
+        return index
+
+    # This index followed by `other`, an index over the next rows (numbered from 0) with the
+    # same columns: how CacheWriter folds in the index of each chunk it writes
+    def append(self, other):
+        tables = {col: self.fields[col].append(other.fields[col], self.n_rows) for col in self.columns}
+        lens = {col: np.concatenate([n, other.doc_lens[col]]) for col, n in self.doc_lens.items()}
+        index = InvertedIndex.__new__(InvertedIndex)
+        index.columns = self.columns
+        index._build(self.n_rows + other.n_rows, tables, lens)
+        return index
+
+    # New index after rows were removed, moved or added: row_map[old_row] is the row's new id
+    # (-1 if removed) and df_added lands at rows added_rows. Only df_added is tokenized.
+    # While surviving rows keep their order the added postings are merged into the sorted
+    # tables; a reordered dataset re-sorts the renumbered postings instead.
+    def apply_delta(self, row_map, df_added, added_rows, n_rows):
+        added = self._tokenize(df_added)
+        kept = row_map >= 0
+        in_order = bool(np.all(np.diff(row_map[kept]) > 0))
+        tables, lens = {}, {}
+        for col in self.columns:
+            table = self.fields[col]
+            add_rows, add_codes, add_positions, add_vocab, add_lens = added[col]
+            add_rows = added_rows[add_rows]
+            if col in RANK_FIELDS:
+                lens[col] = np.zeros(n_rows, dtype=np.int64)
+                lens[col][row_map[kept]] = self.doc_lens[col][kept]
+                lens[col][added_rows] = add_lens
+            if in_order:
+                tables[col] = table.merge(row_map, add_rows, add_codes, add_positions, add_vocab)
+                continue
+            rows, codes, positions = table.triples()
+            new_rows = row_map[rows]
+            keep = new_rows >= 0
+            codes, vocab = _merge_codes([(codes[keep], table.vocab), (add_codes, add_vocab)])
+            positions = None if positions is None else np.concatenate([positions[keep], add_positions])
+            tables[col] = PostingTable(np.concatenate([new_rows[keep], add_rows]), codes, positions, vocab)
+        index = InvertedIndex.__new__(InvertedIndex)
+        index.columns = self.columns
+        index._build(n_rows, tables, lens)
+        return index
+
+    # Tables a node searches: its field's, or every column's when it has none
+    def _tables(self, field):
+        if field is None: return list(self.fields.values())
+        table = self.fields.get(field)
+        return [] if table is None else [table]
+
+    # Estimated number of matching rows, used to order AND operands
+    def estimate(self, node):
+        kind = node[0]
+        if kind in ('term', 'prefix', 'phrase'):
+            count = 0
+            for table in self._tables(node[1]):
+                if kind == 'term': count += table.count(node[2])
+                elif kind == 'prefix': count += table.count_prefix(node[2])
+                else: count += min(table.count(t) for t in node[2])
+            return min(self.n_rows, count)
+        if kind == 'near': return min(self.estimate(c) for c in node[2])
+        if kind == 'and': return min((self.estimate(c) for c in node[1] if c[0] != 'not'), default=self.n_rows)
+        if kind == 'or': return min(self.n_rows, sum(self.estimate(c) for c in node[1]))
+        return self.n_rows - self.estimate(node[1])
+
+    # Reorder every AND so the most selective operands run first and exclusions run last
+    def optimize(self, node):
+        if node is None: return None
+        kind = node[0]
+        if kind == 'and':
+            children = [self.optimize(c) for c in node[1]]
+            include = sorted((c for c in children if c[0] != 'not'), key=self.estimate)
+            exclude = sorted((c for c in children if c[0] == 'not'), key=lambda c: -self.estimate(c[1]))
+            return ('and', tuple(include + exclude))
+        if kind == 'or': return ('or', tuple(self.optimize(c) for c in node[1]))
+        if kind == 'not': return ('not', self.optimize(node[1]))
+        return node
+
+    # Global query plus sidebar field filters (bare words as prefixes) -> one optimized plan
+    def compile(self, query, field_filters=None):
+        nodes = [parse_query(query)] if query else []
+        for field, f_query in (field_filters or {}).items():
+            if f_query: nodes.append(parse_query(f_query, field, prefix=True))
+        nodes = [n for n in nodes if n is not None]
+        if not nodes: return None
+        return self.optimize(nodes[0] if len(nodes) == 1 else ('and', tuple(nodes)))
+
+    def execute(self, node):
+        if node is None: return self.all_ids
+        kind = node[0]
+        if kind in ('term', 'prefix', 'phrase'):
+            return _union([self._lookup(table, node) for table in self._tables(node[1])])
+        if kind == 'near': return self._near(node[1], *node[2])
+        if kind == 'and':
+            ids = None
+            for child in node[1]:
+                if ids is not None and ids.size == 0: break
+                if child[0] == 'not':
+                    ids = self.all_ids if ids is None else ids
+                    ids = np.setdiff1d(ids, self.execute(child[1]), assume_unique=True)
+                else:
+                    part = self.execute(child)
+                    ids = part if ids is None else np.intersect1d(ids, part, assume_unique=True)
+            return ids
+        if kind == 'or':
+            parts = [self.execute(c) for c in node[1]]
+            return np.unique(np.concatenate(parts)) if parts else EMPTY_IDS
+        return np.setdiff1d(self.all_ids, self.execute(node[1]), assume_unique=True)
+
+    # Rows of one table matching a term, prefix or phrase
+    def _lookup(self, table, node):
+        kind = node[0]
+        if kind == 'term': return table.get(node[2])
+        if kind == 'prefix': return table.get_prefix(node[2])
+        if table.positional: return np.unique(self._occurrences(table, node)[0] >> POS_BITS)
+        ids = table.get(node[2][0])
+        for tok in node[2][1:]:
+            if ids.size == 0: break
+            ids = np.intersect1d(ids, table.get(tok), assume_unique=True)
+        return ids
+
+    # Sorted occurrence keys of a positional node (phrase: key of its first token) and its span
+    def _occurrences(self, table, node):
+        kind = node[0]
+        if kind == 'term': return table.occurrences(node[2]), 0
+        if kind == 'prefix': return table.prefix_occurrences(node[2]), 0
+        tokens = node[2]
+        starts = table.occurrences(tokens[0])
+        for offset, tok in enumerate(tokens[1:], 1):
+            if starts.size == 0: break
+            starts = starts[_member(table.occurrences(tok), starts + offset)]
+        return starts, len(tokens) - 1
+
+    # Rows where an occurrence of right starts within n tokens of left, either side, in
+    # one column (row-level columns: rows where both occur)
+    def _near(self, n, left, right):
+        if left[1] is not None and right[1] is not None and left[1] != right[1]: return EMPTY_IDS
+        parts = []
+        for table in self._tables(left[1] if left[1] is not None else right[1]):
+            if not table.positional:
+                parts.append(np.intersect1d(self._lookup(table, left), self._lookup(table, right), assume_unique=True))
+                continue
+            a, span_a = self._occurrences(table, left)
+            b, span_b = self._occurrences(table, right)
+            if a.size == 0 or b.size == 0: continue
+            lo = np.searchsorted(b, a - n - span_b, side='left')
+            hi = np.searchsorted(b, a + span_a + n, side='right')
+            parts.append(np.unique(a[hi > lo] >> POS_BITS))
+        return _union(parts)
+
+    # Sorted array of matching row positions
+    def search(self, query, field_filters=None):
+        return self.execute(self.compile(query, field_filters))
+
+    # Positive (kind, field, token) leaves of a plan; terms under NOT do not contribute to relevance
+    def _scoring_terms(self, node, out):
+        if node is None or node[0] == 'not': return out
+        kind = node[0]
+        if kind in ('term', 'prefix'): out.append((kind, node[1], node[2]))
+        elif kind == 'phrase': out.extend(('term', node[1], t) for t in node[2])
+        else:
+            for child in node[-1]: self._scoring_terms(child, out)
+        return out
+
+    # BM25 contribution of the vocabulary slice [lo, hi) of one field, added into scores (aligned with ids)
+    def _bm25(self, field, lo, hi, ids, scores, boost):
+        table = self.fields[field]
+        start, end = table.bounds[lo], table.bounds[hi]
+        if start == end: return
+        rows, tf = table.rows[start:end], table.tf[start:end]
+        dfs = np.diff(table.bounds[lo:hi + 1])
+        idf = np.repeat(np.log1p((self.n_rows - dfs + 0.5) / (dfs + 0.5)), dfs)
+        pos = np.searchsorted(ids, rows)
+        hit = pos < ids.size
+        hit[hit] = ids[pos[hit]] == rows[hit]
+        if not hit.any(): return
+        tf = tf[hit]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[field][rows[hit]] / self.avg_lens[field])
+        np.add.at(scores, pos[hit], boost * idf[hit] * tf * (BM25_K1 + 1) / (tf + norm))
+
+    def score(self, node, ids):
+        scores = np.zeros(ids.size)
+        if ids.size == 0: return scores
+        for kind, field, tok in self._scoring_terms(node, []):
+            for rank_field, boost in RANK_FIELDS.items():
+                if field is not None and field != rank_field: continue
+                if rank_field not in self.fields: continue
+                table = self.fields[rank_field]
+                lo, hi = table.term_range(tok) if kind == 'term' else table.prefix_range(tok)
+                self._bm25(rank_field, lo, hi, ids, scores, boost)
+        return scores
+
+    # Top-k matches by BM25: a partition finds the k-th best score and only the
+    # rows at or above it are sorted (ties broken by file order, which is also
+    # the fallback when the plan has nothing to score)
+    def rank(self, node, ids, k=50):
+        scores = self.score(node, ids)
+        if not scores.any(): return ids[:k], scores[:k]
+        if ids.size > k > 0:
+            kth = np.partition(scores, ids.size - k)[ids.size - k]
+            top = np.flatnonzero(scores >= kth)
+        else:
+            top = np.arange(ids.size)
+        top = top[np.lexsort((ids[top], -scores[top]))][:k]
+        return ids[top], scores[top]
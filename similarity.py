@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from search_engine import RANK_FIELDS, _merge_codes
+
+# --- KYRIX SIMILARITY ---
+# Sparse TF-IDF vectors over titles and abstracts, taken from the search index's posting
+# tables (no second tokenization). A record's nearest filings are scored through the
+# postings of its own terms only; near-duplicate groups come from MinHash signatures
+# bucketed by LSH bands, so neither path compares every pair of records.
+
+# Terms in more than this share of records carry no signal; terms in one record match nothing
+MAX_DF = 0.1
+# MinHash: NUM_PERM hash functions in LSH bands of BAND_ROWS (candidate pairs from
+# Jaccard ~0.5 up); buckets over MAX_BUCKET records are paired in linear, not quadratic, time
+NUM_PERM = 64
+BAND_ROWS = 4
+MAX_BUCKET = 50
+MINHASH_PRIME = (1 << 31) - 1
+DUPLICATE_THRESHOLD = 0.8
+
+class SimilarityIndex:
+    def __init__(self, index):
+        self.n_rows = index.n_rows
+        rows, codes, tf = [], [], []
+        parts = []
+        for field, boost in RANK_FIELDS.items():
+            table = index.fields.get(field)
+            if table is None: continue
+            parts.append((np.repeat(np.arange(len(table.vocab)), np.diff(table.bounds)), table.vocab))
+            rows.append(table.rows)
+            tf.append(table.tf * boost)
+        codes, _ = _merge_codes(parts)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        tf = np.concatenate(tf) if tf else np.empty(0)
+        # One (term, row) entry with the title and abstract counts summed
+        order = np.lexsort((rows, codes))
+        codes, rows, tf = codes[order], rows[order], tf[order]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+        starts = np.flatnonzero(first)
+        codes, rows, tf = codes[starts], rows[starts], np.add.reduceat(tf, starts) if len(starts) else tf
+        # Keep terms in 2..MAX_DF records; weight (1 + log tf) * idf, rows L2-normalized
+        n_terms = int(codes.max()) + 1 if len(codes) else 0
+        df = np.bincount(codes, minlength=n_terms)
+        keep_term = (df >= 2) & (df <= max(2, MAX_DF * self.n_rows))
+        keep = keep_term[codes]
+        codes, rows, tf = codes[keep], rows[keep], tf[keep]
+        codes = (np.cumsum(keep_term) - 1)[codes]
+        idf = np.log(self.n_rows / df[keep_term])
+        weights = (1 + np.log(tf)) * idf[codes]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=self.n_rows))
+        weights = weights / norms[rows]
+        # By term (postings) for scoring, and by row for a record's own terms
+        self.term_rows, self.term_weights = rows, weights
+        self.term_bounds = np.searchsorted(codes, np.arange(len(idf) + 1))
+        by_row = np.argsort(rows, kind='stable')
+        self.row_terms, self.row_weights = codes[by_row], weights[by_row]
+        self.row_bounds = np.searchsorted(rows[by_row], np.arange(self.n_rows + 1))
+        self._signatures = None
+        self._clusters = {}
+
+    def _slices(self, bounds, keys):
+        starts, ends = bounds[keys], bounds[keys + 1]
+        lens = ends - starts
+        return np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+
+    # Cosine similarity of every record to `row`, through the postings of row's terms
+    def scores(self, row):
+        lo, hi = self.row_bounds[row], self.row_bounds[row + 1]
+        terms, weights = self.row_terms[lo:hi], self.row_weights[lo:hi]
+        pos = self._slices(self.term_bounds, terms)
+        lens = np.diff(self.term_bounds)[terms]
+        return np.bincount(self.term_rows[pos], weights=self.term_weights[pos] * np.repeat(weights, lens), minlength=self.n_rows)
+
+    # The k records most similar to `row` (excluding itself) with their cosine scores
+    def similar(self, row, k=10, min_score=0.0):
+        scores = self.scores(row)
+        scores[row] = 0
+        candidates = np.flatnonzero(scores > min_score)
+        if candidates.size > k: candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return candidates, scores[candidates]
+
+    # MinHash signature per record over its set of terms (records without terms stay at max)
+    @property
+    def signatures(self):
+        if self._signatures is None:
+            rng = np.random.default_rng(0)
+            a = rng.integers(1, MINHASH_PRIME, NUM_PERM, dtype=np.uint64)
+            b = rng.integers(0, MINHASH_PRIME, NUM_PERM, dtype=np.uint64)
+            sig = np.full((self.n_rows, NUM_PERM), np.iinfo(np.uint64).max, dtype=np.uint64)
+            has_terms = np.flatnonzero(np.diff(self.row_bounds) > 0)
+            terms = self.row_terms.astype(np.uint64)
+            for p in range(NUM_PERM):
+                hashed = (a[p] * terms + b[p]) % np.uint64(MINHASH_PRIME)
+                if len(has_terms): sig[has_terms, p] = np.minimum.reduceat(hashed, self.row_bounds[has_terms])
+            self._signatures = sig
+        return self._signatures
+
+    # Candidate pairs (i < j) sharing at least one LSH band bucket
+    def candidate_pairs(self):
+        sig = self.signatures
+        rows = np.flatnonzero(np.diff(self.row_bounds) > 0)
+        pairs = []
+        for start in range(0, NUM_PERM - BAND_ROWS + 1, BAND_ROWS):
+            # Band values hashed into one bucket key (a collision only adds a candidate)
+            keys = sig[rows, start]
+            for col in range(start + 1, start + BAND_ROWS):
+                keys = keys * np.uint64(0x100000001B3) ^ sig[rows, col]
+            order = np.argsort(keys, kind='stable')
+            keys, members = keys[order], rows[order]
+            # Every pair within small buckets; large ones only pair each member with its
+            # neighbour and the bucket's first member, which still connects the group
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            sizes = np.diff(np.r_[starts, len(keys)])
+            small = np.repeat(sizes, sizes) <= MAX_BUCKET
+            for d in range(1, min(MAX_BUCKET, len(keys))):
+                same = (keys[d:] == keys[:-d]) & (small[d:] | (d == 1))
+                if not same.any(): break
+                pairs.append(np.stack([members[:-d][same], members[d:][same]], axis=1))
+            large = ~small
+            if large.any():
+                first = np.repeat(members[starts], sizes)[large]
+                pairs.append(np.stack([first, members[large]], axis=1))
+        if not pairs: return np.empty((0, 2), dtype=np.int64)
+        pairs = np.sort(np.concatenate(pairs), axis=1)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        pairs = np.unique(pairs[:, 0] * self.n_rows + pairs[:, 1])
+        return np.stack([pairs // self.n_rows, pairs % self.n_rows], axis=1)
+
+    # Records whose estimated Jaccard similarity to `row` reaches threshold (excluding itself)
+    def duplicates(self, row, threshold=DUPLICATE_THRESHOLD):
+        if self.row_bounds[row] == self.row_bounds[row + 1]: return np.empty(0, dtype=np.int64)
+        sig = self.signatures
+        match = (sig == sig[row]).mean(axis=1) >= threshold
+        match[row] = False
+        return np.flatnonzero(match)
+
+    # Near-duplicate groups: cluster id per record (the smallest row of its group); records
+    # join a group through any pair whose estimated Jaccard similarity reaches threshold
+    def clusters(self, threshold=DUPLICATE_THRESHOLD):
+        if threshold not in self._clusters: self._clusters[threshold] = self._cluster(threshold)
+        return self._clusters[threshold]
+
+    def _cluster(self, threshold):
+        pairs = self.candidate_pairs()
+        sig = self.signatures
+        jaccard = (sig[pairs[:, 0]] == sig[pairs[:, 1]]).mean(axis=1) if len(pairs) else np.empty(0)
+        return connected_components(self.n_rows, pairs[jaccard >= threshold])
+
+# Component label per node (its smallest member) for an (m, 2) array of edges, by
+# min-label propagation with pointer jumping
+def connected_components(n, pairs):
+    labels = np.arange(n)
+    while len(pairs):
+        low = np.minimum(labels[pairs[:, 0]], labels[pairs[:, 1]])
+        before = labels.copy()
+        np.minimum.at(labels, pairs[:, 0], low)
+        np.minimum.at(labels, pairs[:, 1], low)
+        labels = labels[labels]
+        if np.array_equal(labels, before): break
+    return labels
+
+# Groups of two or more near-duplicate records: row, cluster and group size, largest first
+def duplicate_groups(labels):
+    sizes = np.bincount(labels, minlength=len(labels))
+    rows = np.flatnonzero(sizes[labels] > 1)
+    groups = pd.DataFrame({'row': rows, 'cluster': labels[rows], 'size': sizes[labels[rows]]})
+    return groups.sort_values(['size', 'cluster', 'row'], ascending=[False, True, True], ignore_index=True)
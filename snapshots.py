@@ -0,0 +1,477 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+from data_store import CACHE_DIR, ENTITY_FILE, INDEX_FILE, SUMMARY_FILE, CacheWriter, cache_path, empty_dataset, preprocess, read_cache, read_chunks, sources_hash, write_cache
+from search_engine import InvertedIndex
+from analytics import CUBE_DIMS, IPC_CUBE_DIMS, build_cubes, update_cubes, landing_summary, TrendEngine
+from entities import build_aliases, load_aliases, resolve_cube, save_aliases
+from ipc_hierarchy import IpcHierarchy
+from similarity import SimilarityIndex
+
+# --- KYRIX SNAPSHOTS ---
+# Successive extracts of the same CSV kept as a delta log keyed on Application Number.
+# Every snapshot file lists all of its record keys with a content hash per record, but
+# carries the raw fields only for records added or changed since the previous snapshot.
+# Loaded snapshots switch to each other by applying just the records that differ.
+
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshots")
+KEY_COLUMN = 'Application Number'
+EMPTY_KEYS = np.empty(0, dtype=object)
+EMPTY_HASHES = np.empty(0, dtype=np.uint64)
+
+# Application Number, suffixed '#2', '#3'... when it repeats (extracts carry exact duplicate
+# rows, and each still counts as a filing). `seen` counts numbers from earlier chunks.
+def record_keys(body, seen=None):
+    appno = body[KEY_COLUMN].fillna('-').astype(str).str.strip()
+    dup = appno.groupby(appno).cumcount().to_numpy()
+    if seen is not None and len(seen): dup = dup + seen.reindex(appno).fillna(0).to_numpy(np.int64)
+    return appno.where(dup == 0, appno + '#' + (dup + 1).astype(str)).to_numpy(object)
+
+def record_hashes(body):
+    return pd.util.hash_pandas_object(body, index=False).to_numpy(np.uint64)
+
+class SnapshotLog:
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.entries = self._read_manifest()
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _write_manifest(self):
+        tmp = f"{self.manifest_path}.tmp-{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def _path(self, snapshot_id):
+        return os.path.join(self.root, f"{snapshot_id:05d}.feather")
+
+    def ids(self):
+        return [e['id'] for e in self.entries]
+
+    def latest(self):
+        return self.entries[-1]['id'] if self.entries else None
+
+    def entry(self, snapshot_id):
+        return next((e for e in self.entries if e['id'] == snapshot_id), None)
+
+    # Log the extracts at `paths` (read together, as one dataset) and return their snapshot id.
+    # Extracts already in the log return the existing id; files are only re-hashed when their
+    # size or mtime changes. The first snapshot also fills the dataset cache in the same pass,
+    # preprocessing chunks on `executor` (a process pool) when given; later ones get theirs
+    # when a loaded snapshot switches to them (LiveDataset.switch).
+    def ingest(self, paths, executor=None):
+        paths = [p for p in paths if os.path.exists(p) and os.stat(p).st_size > 0]
+        if not paths: return None
+        signature = tuple((os.path.abspath(p), os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in paths)
+        with self._lock:
+            seen = self._seen.get(signature)
+            if seen is not None: return seen
+            try:
+                snapshot_id = self._ingest(paths, executor)
+            except Exception:
+                return None
+            self._seen = {signature: snapshot_id}
+            return snapshot_id
+
+    def _ingest(self, paths, executor=None):
+        source_hash = sources_hash(paths)
+        self.entries = self._read_manifest()
+        for e in self.entries:
+            if e['hash'] == source_hash: return e['id']
+        prev = self.latest()
+        snapshot_id = 0 if prev is None else prev + 1
+        if prev is not None:
+            prev_keys, prev_hashes = self.keys(prev)
+            prev_index = pd.Index(prev_keys)
+        target = cache_path(source_hash)
+        cache = CacheWriter(target, executor) if prev is None and not os.path.isdir(target) else None
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self._path(snapshot_id)}.tmp-{os.getpid()}"
+        writer, col_map, columns = None, None, None
+        seen = pd.Series(dtype=np.int64)
+        counts = {'records': 0, 'added': 0, 'changed': 0, 'matched': 0}
+        try:
+            for chunk_map, records in read_chunks(paths):
+                if cache is not None: cache.add(chunk_map, records)
+                keys, hashes = record_keys(records, seen), record_hashes(records)
+                appno = records[KEY_COLUMN].fillna('-').astype(str).str.strip().value_counts()
+                seen = seen.add(appno, fill_value=0).astype(np.int64)
+
+                # --- DIFF AGAINST THE LATEST SNAPSHOT: payload = records added or changed ---
+                if prev is None:
+                    known = np.zeros(len(keys), dtype=bool)
+                    payload = ~known
+                else:
+                    pos = prev_index.get_indexer(keys)
+                    known = pos >= 0
+                    payload = ~known
+                    payload[known] = prev_hashes[pos[known]] != hashes[known]
+                counts['records'] += len(keys)
+                counts['added'] += int((~known).sum())
+                counts['changed'] += int((payload & known).sum())
+                counts['matched'] += int(known.sum())
+
+                table = records.astype(object)
+                table.loc[~payload] = None
+                table['__key__'] = keys
+                table['__hash__'] = hashes
+                table['__payload__'] = payload
+                if writer is None:
+                    col_map, columns = chunk_map, list(records.columns)
+                    schema = pa.schema([(c, pa.string()) for c in columns] + [('__key__', pa.string()), ('__hash__', pa.uint64()), ('__payload__', pa.bool_())])
+                    writer = pa.ipc.new_file(tmp, schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))
+                writer.write_table(pa.Table.from_pandas(table, schema=schema, preserve_index=False))
+        finally:
+            if writer is not None: writer.close()
+            if cache is not None: cache.close()
+        if writer is None: return None
+        os.replace(tmp, self._path(snapshot_id))
+        self.entries.append({
+            'id': snapshot_id,
+            'source': ', '.join(os.path.basename(p) for p in paths),
+            'hash': source_hash,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'records': counts['records'],
+            'added': counts['added'],
+            'changed': counts['changed'],
+            'removed': 0 if prev is None else len(prev_keys) - counts['matched'],
+            'columns': columns,
+            'category_row': [col_map[c] for c in columns],
+        })
+        self._write_manifest()
+        return snapshot_id
+
+    # Record keys and content hashes of a snapshot, in file order (key columns only are read)
+    def keys(self, snapshot_id):
+        table = feather.read_table(self._path(snapshot_id), columns=['__key__', '__hash__'], memory_map=True)
+        return table['__key__'].to_numpy().astype(object), table['__hash__'].to_numpy().astype(np.uint64)
+
+    # Raw fields for the given (key, hash) records, from the payloads of snapshots up to
+    # snapshot_id, newest first. The key columns pick the wanted rows in Arrow and only the
+    # record batches holding them are decompressed; older snapshots are not read once every
+    # record is found.
+    def records(self, snapshot_id, keys, hashes):
+        columns = self.entry(snapshot_id)['columns']
+        wanted = pd.Series(keys, dtype=str) + ':' + pd.Series(hashes, dtype=np.uint64).astype(str)
+        missing = set(wanted)
+        key_set = pa.array(pd.unique(np.asarray(keys, dtype=object)), type=pa.string())
+        payloads = []
+        for e in reversed(self.entries):
+            if e['id'] > snapshot_id: continue
+            if not missing: break
+            path = self._path(e['id'])
+            marks = feather.read_table(path, columns=['__key__', '__payload__'], memory_map=True)
+            hit = pc.and_(marks['__payload__'], pc.is_in(marks['__key__'], value_set=key_set)).to_numpy()
+            # Key column chunks are the file's record batches
+            bounds = np.cumsum([0] + [len(c) for c in marks['__key__'].chunks])
+            with pa.memory_map(path) as source:
+                reader = pa.ipc.open_file(source)
+                batches = [reader.get_batch(i).filter(pa.array(hit[lo:hi])) for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])) if hit[lo:hi].any()]
+                if not batches: continue
+                part = pa.Table.from_batches(batches).to_pandas()
+            part.index = part['__key__'] + ':' + part['__hash__'].astype(str)
+            part = part[part.index.isin(missing)]
+            missing.difference_update(part.index)
+            payloads.append(part)
+        if not payloads: return pd.DataFrame(columns=columns, dtype=str)
+        pool = pd.concat(payloads)
+        pool = pool[~pool.index.duplicated(keep='first')]
+        return pool.loc[wanted.to_numpy(), columns].astype(str).reset_index(drop=True)
+
+    # The snapshot as read_csv would return it: category row first, then the records
+    def raw_frame(self, snapshot_id):
+        e = self.entry(snapshot_id)
+        keys, hashes = self.keys(snapshot_id)
+        category_row = pd.DataFrame([e['category_row']], columns=e['columns'], dtype=str)
+        return pd.concat([category_row, self.records(snapshot_id, keys, hashes)], ignore_index=True)
+
+    # Records that differ between two snapshots, from their key lists alone
+    def diff(self, old_id, new_id):
+        old_keys, old_hashes = self.keys(old_id)
+        new_keys, new_hashes = self.keys(new_id)
+        pos = pd.Index(old_keys).get_indexer(new_keys)
+        known = pos >= 0
+        changed = np.zeros(len(new_keys), dtype=bool)
+        changed[known] = old_hashes[pos[known]] != new_hashes[known]
+        removed = np.ones(len(old_keys), dtype=bool)
+        removed[pos[known]] = False
+        return pd.DataFrame({
+            KEY_COLUMN: np.concatenate([new_keys[~known], new_keys[changed], old_keys[removed]]),
+            'Change': ['Added'] * int((~known).sum()) + ['Changed'] * int(changed.sum()) + ['Removed'] * int(removed.sum()),
+        })
+
+# Frames, search index, cubes and trend engines for one snapshot. The index and cubes are
+# built on first use, or carried over incrementally when switching from another snapshot.
+# A dataset read from the Arrow cache (cache_dir) also keeps its search index there.
+class LiveDataset:
+    def __init__(self, dataset, keys=EMPTY_KEYS, hashes=EMPTY_HASHES, snapshot_id=None, cache_dir=None):
+        self.dataset = dataset
+        self.keys = keys
+        self.hashes = hashes
+        self.snapshot_id = snapshot_id
+        self.cache_dir = cache_dir
+        self._index = None
+        self._raw_cubes = None
+        self._cubes = None
+        self._aliases = None
+        self._summary = None
+        self._trends = {}
+        self._numbers = None
+        self._ipc = None
+        self._similarity = None
+        self._lock = threading.RLock()
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None and self.cache_dir is not None:
+                try:
+                    self._index = InvertedIndex.load(os.path.join(self.cache_dir, INDEX_FILE))
+                except (OSError, KeyError, ValueError):
+                    pass
+            if self._index is None: self.build_index()
+            return self._index
+
+    # Tokenize (optionally on a process pool) and save next to the cached frames
+    def build_index(self, executor=None):
+        index = InvertedIndex(self.dataset[0], executor=executor)
+        self._save_index(index)
+        with self._lock:
+            self._index = index
+        return index
+
+    def _save_index(self, index):
+        if self.cache_dir is None: return
+        try:
+            index.save(os.path.join(self.cache_dir, INDEX_FILE))
+        except OSError:
+            pass
+
+    # Alias -> entity tables for firms and applicants, saved next to the cached frames
+    @property
+    def aliases(self):
+        with self._lock:
+            if self._aliases is None and self.cache_dir is not None:
+                try:
+                    self._aliases = load_aliases(os.path.join(self.cache_dir, ENTITY_FILE))
+                except (OSError, ValueError, pa.ArrowInvalid):
+                    pass
+            if self._aliases is None:
+                self._aliases = build_aliases(self.dataset[2])
+                if self.cache_dir is not None:
+                    try:
+                        save_aliases(self._aliases, os.path.join(self.cache_dir, ENTITY_FILE))
+                    except OSError:
+                        pass
+            return self._aliases
+
+    # Count cubes with Firm resolved to entities. The raw cubes (spellings as filed) are what
+    # a snapshot switch adjusts; each snapshot resolves them with its own alias table.
+    @property
+    def cubes(self):
+        with self._lock:
+            if self._cubes is None:
+                if self._raw_cubes is None: self._raw_cubes = build_cubes(self.dataset[2], self.dataset[3])
+                self._cubes = tuple(resolve_cube(c, self.aliases, dims) for c, dims in zip(self._raw_cubes, (CUBE_DIMS, IPC_CUBE_DIMS)))
+            return self._cubes
+
+    # Landing summary of the Strategic Analysis view, saved next to the cached frames
+    @property
+    def summary(self):
+        with self._lock:
+            if self._summary is None:
+                self._summary = landing_summary(self.cubes[0], self.dataset[2], len(self.dataset[0]))
+                if self.cache_dir is not None:
+                    try:
+                        _write_json(self._summary, os.path.join(self.cache_dir, SUMMARY_FILE))
+                    except OSError:
+                        pass
+            return self._summary
+
+    # Application Number -> row positions, as a hashed pandas Index (numbers can repeat)
+    @property
+    def numbers(self):
+        with self._lock:
+            if self._numbers is None: self._numbers = pd.Index(self.dataset[0][KEY_COLUMN])
+            return self._numbers
+
+    # TF-IDF and MinHash similarity over titles and abstracts, from the search index's postings
+    @property
+    def similarity(self):
+        with self._lock:
+            if self._similarity is None: self._similarity = SimilarityIndex(self.index)
+            return self._similarity
+
+    # Parsed IPC codes of the link table (section to subgroup) for range lookups at any level
+    @property
+    def ipc(self):
+        with self._lock:
+            if self._ipc is None: self._ipc = IpcHierarchy(self.dataset[3].get('IPC_Clean', []), self.dataset[3].get('row_id', []))
+            return self._ipc
+
+    # Dense monthly trend arrays for one cube dimension ('IPC_Class3', 'Firm' or 'Application Type (ID)')
+    def trend(self, entity):
+        with self._lock:
+            if entity not in self._trends:
+                cube, ipc_cube = self.cubes
+                self._trends[entity] = TrendEngine(ipc_cube if entity.startswith('IPC') else cube, entity)
+            return self._trends[entity]
+
+    # Another snapshot, built from this one: records it shares (same key and hash) are reused,
+    # only added/changed records are preprocessed and tokenized, and the cubes are adjusted
+    # by the difference. Rows end up in the target snapshot's file order.
+    def switch(self, log, snapshot_id):
+        keys, hashes = log.keys(snapshot_id)
+        df_search, _, df_analysis, df_exp = self.dataset
+        n_old = len(df_search)
+        pos = pd.Index(self.keys).get_indexer(keys)
+        reuse = pos >= 0
+        reuse[reuse] = self.hashes[pos[reuse]] == hashes[reuse]
+
+        e = log.entry(snapshot_id)
+        category_row = pd.DataFrame([e['category_row']], columns=e['columns'], dtype=str)
+        fresh = pd.concat([category_row, log.records(snapshot_id, keys[~reuse], hashes[~reuse])], ignore_index=True)
+        add_search, col_map, add_analysis, add_exp = preprocess(fresh)
+
+        # source[new_row] indexes old rows then added rows; new_id maps both to the new order
+        source = np.empty(len(keys), dtype=np.int64)
+        source[reuse] = pos[reuse]
+        source[~reuse] = n_old + np.arange(int((~reuse).sum()))
+        new_id = np.full(n_old + len(add_search), -1, dtype=np.int64)
+        new_id[source] = np.arange(len(keys))
+
+        new_search = _combine(df_search, add_search).iloc[source].reset_index(drop=True)
+        new_search = _restore_categories(new_search, df_search)
+        analysis = _combine(df_analysis, _shift(add_analysis, n_old))
+        analysis.index = new_id[analysis.index.to_numpy()]
+        analysis = analysis[analysis.index >= 0].sort_index(kind='stable')
+        analysis = _restore_categories(analysis, df_analysis)
+        exp = _combine(df_exp, add_exp.assign(row_id=add_exp['row_id'] + n_old) if len(add_exp) else add_exp)
+        exp['row_id'] = new_id[exp['row_id'].to_numpy()].astype('int32')
+        exp = exp[exp['row_id'] >= 0].sort_values('row_id', kind='stable').reset_index(drop=True)
+        exp = _restore_categories(exp, df_exp)
+
+        # The switched frames fill the target's cache (a cold start of this snapshot reads them),
+        # and its cache dir keeps what this dataset derives
+        target = cache_path(e['hash'])
+        if not os.path.isdir(target) and len(new_search): write_cache(target, (new_search, col_map, analysis, exp))
+        live = LiveDataset((new_search, col_map, analysis, exp), keys, hashes, snapshot_id, target if os.path.isdir(target) else None)
+        with self._lock:
+            if self._index is not None:
+                live._index = self._index.apply_delta(new_id[:n_old], add_search, new_id[n_old:], len(keys))
+                if live.cache_dir is not None and not os.path.exists(os.path.join(live.cache_dir, INDEX_FILE)): live._save_index(live._index)
+            if self._raw_cubes is not None and not analysis.empty:
+                dropped = df_analysis[new_id[:n_old][df_analysis.index.to_numpy()] < 0]
+                removed = build_cubes(dropped, df_exp)
+                added = build_cubes(add_analysis, add_exp) if not add_analysis.empty else tuple(c.iloc[:0] for c in self._raw_cubes)
+                live._raw_cubes = update_cubes(self._raw_cubes, removed, added)
+        return live
+
+def _write_json(value, path):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+def _combine(old, added):
+    if added.empty: return old.copy()
+    return pd.concat([old, added])
+
+def _shift(df, offset):
+    if df.empty: return df
+    return df.set_axis(df.index + offset)
+
+# Categoricals as preprocess() would build them from the combined rows: concatenation turns
+# mismatched categories into plain text and keeps unused ones
+def _restore_categories(df, like):
+    for col in like.columns:
+        if col not in df.columns or not isinstance(like[col].dtype, pd.CategoricalDtype): continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+        else:
+            df[col] = df[col].astype('category')
+    return df
+
+# Loaded snapshots (LRU). A snapshot not yet in memory is switched to from the most recently
+# used one; the very first comes from its Arrow cache, else is switched to from the newest
+# earlier snapshot with a cache, else is rebuilt from the delta log.
+class SnapshotManager:
+    def __init__(self, log=None, max_loaded=3):
+        self.log = log if log is not None else SnapshotLog()
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, snapshot_id):
+        if snapshot_id is None or self.log.entry(snapshot_id) is None: return LiveDataset(empty_dataset())
+        with self._lock:
+            live = self._loaded.get(snapshot_id)
+            if live is not None:
+                self._loaded.move_to_end(snapshot_id)
+                return live
+            if self._loaded: live = next(reversed(self._loaded.values())).switch(self.log, snapshot_id)
+            else: live = self._load(snapshot_id)
+            self._loaded[snapshot_id] = live
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+            return live
+
+    def is_loaded(self, snapshot_id):
+        return snapshot_id in self._loaded
+
+    # A snapshot's landing summary without loading its frames: from the loaded dataset, else
+    # from the cache (None when it has not been computed yet)
+    def summary(self, snapshot_id):
+        live = self._loaded.get(snapshot_id)
+        if live is not None: return live.summary
+        entry = self.log.entry(snapshot_id)
+        if entry is None: return None
+        try:
+            with open(os.path.join(cache_path(entry['hash']), SUMMARY_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, snapshot_id):
+        try:
+            live = self._cached(snapshot_id)
+            if live is not None: return live
+            # No cache yet: switch from the newest earlier snapshot that has one (this writes it)
+            for e in reversed(self.log.entries):
+                if e['id'] >= snapshot_id: continue
+                base = self._cached(e['id'])
+                if base is None: continue
+                if os.path.exists(os.path.join(base.cache_dir, INDEX_FILE)): base.index
+                return base.switch(self.log, snapshot_id)
+            keys, hashes = self.log.keys(snapshot_id)
+            target = cache_path(self.log.entry(snapshot_id)['hash'])
+            dataset = preprocess(self.log.raw_frame(snapshot_id))
+            if not dataset[0].empty: write_cache(target, dataset)
+            return LiveDataset(dataset, keys, hashes, snapshot_id, target if os.path.isdir(target) else None)
+        except Exception:
+            return LiveDataset(empty_dataset())
+
+    # A snapshot from its Arrow cache, or None when there is no usable cache
+    def _cached(self, snapshot_id):
+        target = cache_path(self.log.entry(snapshot_id)['hash'])
+        if not os.path.isdir(target): return None
+        keys, hashes = self.log.keys(snapshot_id)
+        dataset = read_cache(target)
+        if dataset is None or len(dataset[0]) != len(keys): return None
+        return LiveDataset(dataset, keys, hashes, snapshot_id, target)
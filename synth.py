@@ -0,0 +1,295 @@
+import os
+import sys
+import csv
+import argparse
+import numpy as np
+import pandas as pd
+from data_store import CHUNK_ROWS
+
+# --- KYRIX SYNTHETIC EXTRACTS ---
+# Realistic stand-ins for the application extracts at any size: same 24 columns and
+# Raw/Enriched category row, filings growing over the years, Zipf-distributed title and
+# abstract vocabulary with topic words tied to each filing's IPC section, agents and
+# applicants with spelling variants, repeated rows and near-duplicate filings. The same
+# seed always writes the same file. Written chunk by chunk, so any size fits in memory.
+#   python synth.py --rows 100000 [--seed 0] [--types 5:0.7,2:0.3] [-o extract.csv]
+
+# Column -> category row value, in file order
+SCHEMA = {
+    'Application Number': 'Raw', 'Application Date': 'Raw', 'Classification': 'Raw',
+    'Country Name (Priority)': 'Raw', 'Priority Number': 'Raw', 'Priority Date': 'Raw',
+    'Earliest Priority Date': 'Enriched', 'Application Type (ID)': 'Raw',
+    'Title in English': 'Raw', 'Abstract in English': 'Raw',
+    'Data of Applicant - Legal Name in English': 'Raw', 'Data of Applicant - Address': 'Raw',
+    'Data of Applicant - Address (English Only)': 'Enriched', 'Data of Applicant - Address (Arabic Only)': 'Enriched',
+    'Data of Applicant - Email': 'Raw', 'Data of Applicant - Contact Number': 'Raw',
+    'Data of Applicant - Contact Number (Harmonized)': 'Enriched', 'Data of Agent - Name in English': 'Raw',
+    'Data of Agent - Economic License Number': 'Raw', 'Data of Agent - Emirates': 'Raw',
+    'Data of Agent - Email': 'Raw', 'Data of Agent - Contact Number': 'Raw',
+    'Data of Agent - Contact Number (Harmonized)': 'Enriched', 'Data of Agent - Address': 'Raw',
+}
+NO_CLASSIFICATION = 'There are no classifications'
+FIRST_YEAR, LAST_YEAR = 1994, 2025
+DEFAULT_TYPES = {'5': 0.7, '2': 0.3}
+
+# Shares of records, roughly those of the real extracts
+UNCLASSIFIED_SHARE = 0.32
+PRIORITY_SHARE = 0.28
+AGENT_SHARE = 0.45
+UPPER_CASE_SHARE = 0.3
+DAYFIRST_DATE_SHARE = 0.03
+VARIANT_SHARE = 0.03
+APPLICANT_LIST_SHARE = 0.02
+DUPLICATE_SHARE = 0.005
+NEAR_DUPLICATE_SHARE = 0.02
+
+# Words: common fillers first, then topic words per IPC section, then a long tail of
+# generated terms; general words are drawn with Zipf weights over that order
+FILLER_WORDS = ('the a of and to is in with for which said an at least one by on from that as or be are '
+                'wherein each first second having comprising further thereof such means between into').split()
+TOPIC_WORDS = {
+    'A': 'medical patient drug pharmaceutical composition dosage tablet implant surgical catheter food beverage agricultural seed plant cosmetic hair garment footwear toy game sensor therapy',
+    'B': 'vehicle vessel hull conveyor robot cutting grinding printing laminate packaging container bottle lifting crane mooring wheel brake spraying mixing separator filter',
+    'C': 'compound polymer catalyst hydrogen alloy steel cement glass peptide protein enzyme fermentation crystalline synthesis electrolysis coating resin petroleum desalination solvent',
+    'D': 'fiber yarn fabric textile woven nonwoven paper pulp cellulose spinning knitting dyeing laundry thread',
+    'E': 'building wall roof concrete brick drilling wellbore downhole borehole casing tubing door window lock excavation tunnel bridge pavement',
+    'F': 'engine turbine pump valve piston compressor combustion burner boiler heat exchanger cooling refrigerant ventilation pipe lighting lamp weapon bearing gear',
+    'G': 'optical laser signal measuring display camera computer processor memory software data network blockchain learning neural image clock navigation',
+    'H': 'battery cell electrode semiconductor circuit antenna wireless transmitter receiver solar panel photovoltaic inverter voltage transistor charging satellite radio',
+}
+TAIL_SYLLABLES = 'al an ar ba be bo ca ce co da de di el en er fa fe fi ga ge go ha he hi in is ka ke ki la le li lo ma me mi mo na ne ni no or pa pe pi po ra re ri ro sa se si so ta te ti to ur va ve vi xa ze zo'.split()
+TAIL_WORDS = 30_000
+ZIPF_EXPONENT = 1.07
+TOPIC_WORD_SHARE = 0.3
+
+PRIORITY_COUNTRIES = ['United States of America', 'European Patent Office (EPO)', 'Japan', 'China', 'Germany', 'United Kingdom',
+                      'Republic of Korea', 'France', 'Saudi Arabia', 'India', 'Switzerland', 'Australia']
+CITIES = ['Dubai', 'Abu Dhabi', 'Sharjah', 'Ajman', 'Al Ain', 'Ras Al Khaimah', 'Fujairah', 'Umm Al Quwain']
+ARABIC_ADDRESS = 'ص.ب {} دبي الإمارات العربية المتحدة'
+NAME_PARTS = {
+    'first': 'Ahmed Mohammed Fatima Omar Khalid Aisha Hassan Mariam Ali Sara Yousef Layla John Maria Wei Hiroshi Anna Peter'.split(),
+    'last': 'Al Mansouri Haddad Khan Smith Tanaka Chen Muller Rossi Kumar Nasser Saleh Ibrahim Garcia Novak'.split(),
+    'root': 'Gulf Desert Falcon Oasis Pearl Horizon Summit Delta Nova Atlas Zenith Orion Vertex Crescent Harbor Meridian'.split(),
+    'field': 'Energy Technologies Industries Pharma Systems Engineering Solutions Holdings Petroleum Robotics Materials Networks'.split(),
+    'form': ['LLC', 'L.L.C', 'Ltd', 'Inc.', 'GmbH', 'S.A.', 'Co.', 'FZE', 'PLC', ''],
+}
+AGENTS = 30
+AGENT_KINDS = ['Intellectual Property', 'IP Services', 'Patent & Trademark', 'Legal Consultants']
+PERSON_APPLICANT_SHARE = 0.2
+
+def _zipf_weights(n, exponent=ZIPF_EXPONENT):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+# Deterministic pronounceable tail terms (two to four syllables, no repeats)
+def _tail_words(rng, n):
+    syllables = np.array(TAIL_SYLLABLES, dtype=object)
+    words, seen = [], set()
+    while len(words) < n:
+        parts = syllables[rng.integers(0, len(syllables), (n, 4))]
+        lengths = rng.integers(2, 5, n)
+        for row, k in zip(parts, lengths):
+            word = ''.join(row[:k])
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+    return words[:n]
+
+# IPC code pool per section ("B63B 22/04"), popular codes first
+def _ipc_pool(rng, per_section=400):
+    pool = {}
+    for section in TOPIC_WORDS:
+        classes = [f"{section}{c:02d}" for c in rng.choice(np.arange(1, 100), 12, replace=False)]
+        subclasses = [c + chr(ord('A') + int(s)) for c in classes for s in rng.choice(26, 4, replace=False)]
+        codes = {f"{subclasses[int(rng.integers(len(subclasses)))]} {int(rng.integers(1, 100))}/{int(rng.choice([0, 2, 4, 6, 8, 10, 12, 14, 16, 20, 24, 30]) if rng.random() > 0.4 else 0):02d}"
+                 for _ in range(per_section * 2)}
+        pool[section] = np.array(sorted(codes)[:per_section], dtype=object)[rng.permutation(min(per_section, len(codes)))]
+    return pool
+
+def _company(rng):
+    form = NAME_PARTS['form'][int(rng.integers(len(NAME_PARTS['form'])))]
+    name = f"{rng.choice(NAME_PARTS['root'])} {rng.choice(NAME_PARTS['field'])}"
+    if rng.random() < 0.5: name = f"{rng.choice(NAME_PARTS['root'])} {name}"
+    return f"{name} {form}".strip()
+
+def _person(rng):
+    return f"{rng.choice(NAME_PARTS['first'])} {rng.choice(NAME_PARTS['last'])} {rng.choice(NAME_PARTS['last'])}"
+
+# Another spelling of the same name, as filed by a different clerk
+def _variant(name, rng):
+    kind = int(rng.integers(4))
+    if kind == 0: return name.upper()
+    if kind == 1: return name.replace('.', '').replace(',', '')
+    if kind == 2: return name.replace('LLC', 'L L C').replace('L.L.C', 'LLC').replace('Ltd', 'Limited')
+    return name.title() if name.isupper() else name + '.'
+
+class Generator:
+    def __init__(self, rows, seed=0, types=None):
+        self.rows = rows
+        self.rng = np.random.default_rng(seed)
+        rng = self.rng
+        self.types = types or DEFAULT_TYPES
+        self.words = np.array(FILLER_WORDS + sorted({w for ws in TOPIC_WORDS.values() for w in ws.split()}) + _tail_words(rng, TAIL_WORDS), dtype=object)
+        self.word_p = _zipf_weights(len(self.words))
+        self.sections = np.array(list(TOPIC_WORDS))
+        self.topic_words = {s: np.array(ws.split(), dtype=object) for s, ws in TOPIC_WORDS.items()}
+        self.ipc = _ipc_pool(rng)
+        self.ipc_p = {s: _zipf_weights(len(p)) for s, p in self.ipc.items()}
+        # Applicants recur with Zipf popularity (a few heavy filers, a long tail of one-offs)
+        n_applicants = max(50, rows // 3)
+        self.applicants = np.array([_person(rng) if rng.random() < PERSON_APPLICANT_SHARE else _company(rng) for _ in range(n_applicants)], dtype=object)
+        self.applicant_p = _zipf_weights(n_applicants, 0.9)
+        self.agents = pd.DataFrame({
+            'Data of Agent - Name in English': [f"{NAME_PARTS['root'][k % 16]} {AGENT_KINDS[k // 16 % 4]} {rng.choice(['LLC', 'L.L.C', '', 'FZ LLC'])}".strip() for k in range(AGENTS)],
+            'Data of Agent - Economic License Number': [f"{rng.integers(100000, 999999)}" for _ in range(AGENTS)],
+            'Data of Agent - Emirates': rng.choice(['Dubai', 'Dubai', 'Abu Dhabi', 'Sharjah'], AGENTS),
+            'Data of Agent - Email': [f"patents{k}@agent{k}.ae" for k in range(AGENTS)],
+            'Data of Agent - Contact Number': [f"04-{rng.integers(2000000, 4999999)}" for _ in range(AGENTS)],
+        })
+        self.agents['Data of Agent - Contact Number (Harmonized)'] = '+9714' + self.agents['Data of Agent - Contact Number'].str[3:]
+        self.agents['Data of Agent - Address'] = [f"Office {rng.integers(100, 2500)}, {rng.choice(CITIES)}, UAE" for _ in range(AGENTS)]
+        self.agent_p = _zipf_weights(AGENTS, 1.3)
+        # Filing dates for the whole file, in order: volume grows over the years
+        years = np.arange(FIRST_YEAR, LAST_YEAR + 1)
+        year_p = np.linspace(1, 3, len(years)) * rng.uniform(0.6, 1.4, len(years))
+        starts = pd.to_datetime([f"{y}-01-01" for y in years]).to_numpy()
+        year_idx = rng.choice(len(years), rows, p=year_p / year_p.sum())
+        self.dates = np.sort(starts[year_idx] + rng.integers(0, 365, rows).astype('timedelta64[D]'))
+        # Application numbers run P1/year, P2/year... in filing order
+        date_years = self.dates.astype('datetime64[Y]').astype(int) + 1970
+        self.serials = np.arange(rows) - np.searchsorted(date_years, date_years) + 1
+        self.years = date_years
+
+    def _text(self, n_words, sections, upper):
+        rng = self.rng
+        codes = rng.choice(len(self.words), int(n_words.sum()), p=self.word_p)
+        words = self.words[codes]
+        owner = np.repeat(np.arange(len(n_words)), n_words)
+        topic = rng.random(len(words)) < TOPIC_WORD_SHARE
+        for s in np.unique(sections):
+            pick = topic & (sections[owner] == s)
+            words[pick] = self.topic_words[s][rng.integers(0, len(self.topic_words[s]), int(pick.sum()))]
+        bounds = np.r_[0, np.cumsum(n_words)]
+        texts = [' '.join(words[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        texts = pd.Series(texts, dtype=object).str.capitalize()
+        return texts.where(~upper, texts.str.upper())
+
+    def _classification(self, sections):
+        rng = self.rng
+        n_codes = np.minimum(rng.geometric(0.6, len(sections)), 20)
+        unclassified = rng.random(len(sections)) < UNCLASSIFIED_SHARE
+        out = np.full(len(sections), NO_CLASSIFICATION, dtype=object)
+        for s in np.unique(sections):
+            rows = np.flatnonzero((sections == s) & ~unclassified)
+            codes = self.ipc[s][rng.choice(len(self.ipc[s]), int(n_codes[rows].sum()), p=self.ipc_p[s])]
+            bounds = np.r_[0, np.cumsum(n_codes[rows])]
+            out[rows] = [', '.join(codes[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        return out
+
+    def chunk(self, start, stop):
+        rng = self.rng
+        n = stop - start
+        dates = pd.DatetimeIndex(self.dates[start:stop])
+        sections = self.sections[rng.integers(0, len(self.sections), n)]
+        upper = rng.random(n) < UPPER_CASE_SHARE
+        df = pd.DataFrame({'Application Number': [f"P{s}/{y}" for s, y in zip(self.serials[start:stop], self.years[start:stop])]})
+        iso = pd.Series(dates.strftime('%Y-%m-%d'))
+        df['Application Date'] = iso.where(rng.random(n) >= DAYFIRST_DATE_SHARE, pd.Series(dates.strftime('%d/%m/%Y')))
+        df['Classification'] = self._classification(sections)
+        # Priority claims: one or two earlier filings abroad
+        has_priority = rng.random(n) < PRIORITY_SHARE
+        two = has_priority & (rng.random(n) < 0.1)
+        prio_dates = dates - pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+        country = pd.Series(np.array(PRIORITY_COUNTRIES, dtype=object)[rng.integers(0, len(PRIORITY_COUNTRIES), n)])
+        number = pd.Series([f"{rng.integers(10, 99)}/{rng.integers(100, 999)},{rng.integers(100, 999)}" for _ in range(n)])
+        prio = pd.Series(prio_dates.strftime('%Y-%m-%d'))
+        df['Country Name (Priority)'] = (country + pd.Series(np.where(two, ', ' + country, ''))).where(has_priority)
+        df['Priority Number'] = (number + pd.Series(np.where(two, ', ' + number, ''))).where(has_priority)
+        df['Priority Date'] = (prio + pd.Series(np.where(two, ', ' + prio, ''))).where(has_priority)
+        df['Earliest Priority Date'] = prio.where(has_priority, iso)
+        type_labels = np.array(list(self.types), dtype=object)
+        type_p = np.array(list(self.types.values()), dtype=float)
+        df['Application Type (ID)'] = type_labels[rng.choice(len(type_labels), n, p=type_p / type_p.sum())]
+        df['Title in English'] = self._text(rng.integers(2, 16, n), sections, upper)
+        df['Abstract in English'] = self._text(np.maximum(1, rng.lognormal(4.3, 0.7, n).astype(int)), sections, upper)
+        # Applicants, now and then respelled or filed jointly
+        applicants = pd.Series(self.applicants[rng.choice(len(self.applicants), n, p=self.applicant_p)])
+        respell = rng.random(n) < VARIANT_SHARE
+        applicants[respell] = [_variant(a, rng) for a in applicants[respell]]
+        joint = rng.random(n) < APPLICANT_LIST_SHARE
+        applicants[joint] = applicants[joint] + '; ' + pd.Series(self.applicants[rng.integers(0, len(self.applicants), n)])[joint]
+        df['Data of Applicant - Legal Name in English'] = applicants
+        box = pd.Series(rng.integers(1000, 999999, n).astype(str))
+        city = pd.Series(np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), n)])
+        address = 'P.O. Box ' + box + ', ' + city + ', United Arab Emirates'
+        df['Data of Applicant - Address'] = address.where(rng.random(n) < 0.96)
+        df['Data of Applicant - Address (English Only)'] = address.where(rng.random(n) < 0.89)
+        df['Data of Applicant - Address (Arabic Only)'] = box.map(ARABIC_ADDRESS.format).where(rng.random(n) < 0.06)
+        df['Data of Applicant - Email'] = ('ip' + box + '@example.ae').where(rng.random(n) < 0.43)
+        phone = pd.Series(rng.integers(500000000, 569999999, n).astype(str))
+        with_phone = rng.random(n) < 0.17
+        df['Data of Applicant - Contact Number'] = phone.where(with_phone)
+        df['Data of Applicant - Contact Number (Harmonized)'] = ('+971' + phone).where(with_phone & (rng.random(n) < 0.9))
+        # Agent details travel together; direct filings leave them all empty
+        agents = self.agents.iloc[rng.choice(AGENTS, n, p=self.agent_p)].reset_index(drop=True)
+        respell = rng.random(n) < VARIANT_SHARE
+        agents.loc[respell, 'Data of Agent - Name in English'] = [_variant(a, rng) for a in agents.loc[respell, 'Data of Agent - Name in English']]
+        agents = agents.where(pd.Series(rng.random(n) < AGENT_SHARE), axis=0)
+        df = pd.concat([df, agents], axis=1)
+        # Near-duplicate filings (a few words changed) and rows repeated verbatim
+        near = np.flatnonzero(rng.random(n) < NEAR_DUPLICATE_SHARE)
+        near = near[near > 0]
+        sources = (near * rng.random(len(near))).astype(int)
+        for col in ['Title in English', 'Abstract in English']:
+            df.loc[near, col] = [_edit(text, rng) for text in df[col].to_numpy()[sources]]
+        repeat = np.flatnonzero(rng.random(n) < DUPLICATE_SHARE)
+        repeat = repeat[repeat > 0]
+        df.iloc[repeat] = df.iloc[repeat - 1].to_numpy()
+        return df[list(SCHEMA)]
+
+    # CSV with the header and category row, then the records in chunks
+    def write(self, path, chunk_rows=CHUNK_ROWS):
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(SCHEMA))
+            writer.writerow(list(SCHEMA.values()))
+            for start in range(0, self.rows, chunk_rows):
+                self.chunk(start, min(start + chunk_rows, self.rows)).to_csv(f, header=False, index=False)
+        os.replace(tmp, path)
+        return path
+
+# A few words of a text replaced or dropped
+def _edit(text, rng):
+    words = text.split()
+    for _ in range(max(1, len(words) // 20)):
+        i = int(rng.integers(len(words)))
+        if rng.random() < 0.5 and len(words) > 1: del words[i]
+        else: words[i] = words[int(rng.integers(len(words)))]
+    return ' '.join(words)
+
+def generate(path, rows, seed=0, types=None, chunk_rows=CHUNK_ROWS):
+    return Generator(rows, seed, types).write(path, chunk_rows)
+
+# "5:0.7,2:0.3" -> {'5': 0.7, '2': 0.3}
+def parse_types(spec):
+    types = {}
+    for part in spec.split(','):
+        label, _, share = part.partition(':')
+        types[label.strip()] = float(share or 1)
+    return types
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic KYRIX extract.")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--types', type=parse_types, default=None, help="application type mix, e.g. 5:0.7,2:0.3")
+    parser.add_argument('-o', '--output', default=None, help="CSV path (default: synthetic-<rows>.csv)")
+    args = parser.parse_args(argv)
+    path = args.output or f"synthetic-{args.rows}.csv"
+    generate(path, args.rows, args.seed, args.types)
+    print(f"{args.rows} records -> {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())